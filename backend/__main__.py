@@ -8,7 +8,10 @@ from users.api.users import router as users_router
 from notes.api.notes import router as notes_router
 from courses.api.courses import router as courses_router
 from documents.api.documents import router as documents_router
-from core.middleware import auth_middleware, update_metrics_middleware
+from core.configs.rag import rag_settings
+from core.files import files_repository
+from core.llm.rag.service import get_rag
+from core.middleware import auth_middleware, update_metrics_middleware, upload_size_middleware
 from core.monitoring.requests import start_metrics_server
 
 
@@ -38,6 +41,7 @@ def create_app():
         allow_headers=["*"],
         expose_headers=["*"],
     )
+    app.middleware("http")(upload_size_middleware)
     app.middleware("http")(auth_middleware)
     app.middleware("http")(update_metrics_middleware)
 
@@ -49,6 +53,13 @@ def create_app():
     @app.on_event("startup")
     async def startup_event():
         """Запуск seeder при старте приложения"""
+        await files_repository.start()
+        if rag_settings.generation_context_enabled:
+            # Модель грузится при старте, а не в первом запросе на генерацию
+            try:
+                await asyncio.to_thread(get_rag)
+            except Exception as e:
+                logger.error(f"Error during RAG engine initialization: {e}", exc_info=True)
         try:
             from scripts.seed_db import seed_database
             logger.info("Running database seeder...")
@@ -57,6 +68,10 @@ def create_app():
         except Exception as e:
             logger.error(f"Error during database seeding: {e}", exc_info=True)
             # Не прерываем запуск приложения, если seeder упал
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        await files_repository.close()
     
     return app
 
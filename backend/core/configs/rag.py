@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -11,6 +12,39 @@ class QdrantSettings(BaseSettings):
         default="documents",
         env="QDRANT_COLLECTION"
     )
+    # Таймаут одного запроса к Qdrant в секундах
+    timeout: int = Field(
+        default=10,
+        env="QDRANT_TIMEOUT"
+    )
+    # gRPC вместо REST: protobuf дешевле JSON на массовой записи векторов
+    prefer_grpc: bool = Field(
+        default=False,
+        env="QDRANT_PREFER_GRPC"
+    )
+    grpc_port: int = Field(
+        default=6334,
+        env="QDRANT_GRPC_PORT"
+    )
+    # Число точек в одном запросе upsert
+    upsert_batch_size: int = Field(
+        default=256,
+        env="QDRANT_UPSERT_BATCH_SIZE"
+    )
+    # Сколько батчей upsert отправляется в Qdrant параллельно, на все вызовы процесса
+    upsert_parallelism: int = Field(
+        default=4,
+        env="QDRANT_UPSERT_PARALLELISM"
+    )
+    # False — не ждать применения записи в Qdrant. Ускоряет массовую загрузку,
+    # но точки становятся видны поиску с задержкой. Версия коллекции для кэша выдач
+    # при этом меняется сразу после отправки, до применения точек: выдача, закэшированная
+    # API в этом окне, может не содержать новых чанков до следующей записи или до
+    # RAG_SEARCH_RESULT_CACHE_TTL. Для индексации рядом с живым API оставляйте True.
+    upsert_wait: bool = Field(
+        default=True,
+        env="QDRANT_UPSERT_WAIT"
+    )
 
 
 class RAGSettings(BaseSettings):
@@ -26,10 +60,334 @@ class RAGSettings(BaseSettings):
         default=200,
         env="RAG_CHUNK_OVERLAP"
     )
+    # В чем мерить размер чанка: "chars" (chunk_size/chunk_overlap) или "tokens" токенизатора модели
+    chunk_unit: Literal["chars", "tokens"] = Field(
+        default="chars",
+        env="RAG_CHUNK_UNIT"
+    )
+    # Целевой размер чанка в токенах, 0 — все окно модели (max_seq_length без служебных токенов)
+    chunk_tokens: int = Field(
+        default=0,
+        env="RAG_CHUNK_TOKENS"
+    )
+    chunk_overlap_tokens: int = Field(
+        default=24,
+        env="RAG_CHUNK_OVERLAP_TOKENS"
+    )
+    # "recursive" режет по символам, "semantic" — по смысловым границам между предложениями
+    chunker: Literal["recursive", "semantic"] = Field(
+        default="recursive",
+        env="RAG_CHUNKER"
+    )
+    # Перцентиль косинусных расстояний между соседними предложениями, выше которого ставится граница
+    semantic_breakpoint_percentile: float = Field(
+        default=95.0,
+        env="RAG_SEMANTIC_BREAKPOINT_PERCENTILE"
+    )
+    # Чанк короче этого не режется по смысловой границе. Максимум задает chunk_size.
+    semantic_min_chunk_size: int = Field(
+        default=200,
+        env="RAG_SEMANTIC_MIN_CHUNK_SIZE"
+    )
+    # То же при chunk_unit="tokens", максимум задает chunk_tokens
+    semantic_min_chunk_tokens: int = Field(
+        default=32,
+        env="RAG_SEMANTIC_MIN_CHUNK_TOKENS"
+    )
     model_name: str = Field(
         default="sentence-transformers/paraphrase-multilingual-mpnet-base-v2",
         env="RAG_MODEL_NAME"
     )
+    # Бэкенд модели эмбеддингов: "torch" (fp32) или "onnx" через ONNX Runtime,
+    # для него нужна группа зависимостей onnx (optimum[onnxruntime])
+    embedding_backend: Literal["torch", "onnx"] = Field(
+        default="torch",
+        env="RAG_EMBEDDING_BACKEND"
+    )
+    # Каталог с моделью, выгруженной scripts/export_onnx_embedder.py. Без него ONNX
+    # экспортируется из model_name при каждом старте.
+    embedding_onnx_path: str | None = Field(
+        default=None,
+        env="RAG_EMBEDDING_ONNX_PATH"
+    )
+    # Файл внутри модели, например onnx/model_qint8_avx512_vnni.onnx для int8
+    embedding_onnx_file: str = Field(
+        default="onnx/model.onnx",
+        env="RAG_EMBEDDING_ONNX_FILE"
+    )
+    # Минимальное косинусное сходство с векторами torch, при котором ONNX модель
+    # считается совместимой с уже проиндексированной коллекцией
+    embedding_onnx_min_similarity: float = Field(
+        default=0.99,
+        env="RAG_EMBEDDING_ONNX_MIN_SIMILARITY"
+    )
+    warmup_text: str = Field(
+        default="Прогрев модели эмбеддингов",
+        env="RAG_WARMUP_TEXT"
+    )
+    indexer_notify_channel: str = Field(
+        default="documents_uploaded",
+        env="RAG_INDEXER_NOTIFY_CHANNEL"
+    )
+    indexer_sweep_interval: int = Field(
+        default=300,
+        env="RAG_INDEXER_SWEEP_INTERVAL"
+    )
+    indexer_poll_interval: int = Field(
+        default=30,
+        env="RAG_INDEXER_POLL_INTERVAL"
+    )
+    indexer_lease_seconds: int = Field(
+        default=300,
+        env="RAG_INDEXER_LEASE_SECONDS"
+    )
+    indexer_heartbeat_interval: int = Field(
+        default=60,
+        env="RAG_INDEXER_HEARTBEAT_INTERVAL"
+    )
+    indexer_claim_batch_size: int = Field(
+        default=8,
+        env="RAG_INDEXER_CLAIM_BATCH_SIZE"
+    )
+    indexer_queue_size: int = Field(
+        default=8,
+        env="RAG_INDEXER_QUEUE_SIZE"
+    )
+    indexer_download_concurrency: int = Field(
+        default=4,
+        env="RAG_INDEXER_DOWNLOAD_CONCURRENCY"
+    )
+    indexer_parse_workers: int = Field(
+        default=2,
+        env="RAG_INDEXER_PARSE_WORKERS"
+    )
+    indexer_extract_workers: int = Field(
+        default=4,
+        env="RAG_INDEXER_EXTRACT_WORKERS"
+    )
+    indexer_extract_pages_per_task: int = Field(
+        default=16,
+        env="RAG_INDEXER_EXTRACT_PAGES_PER_TASK"
+    )
+    indexer_embed_workers: int = Field(
+        default=1,
+        env="RAG_INDEXER_EMBED_WORKERS"
+    )
+    # Порция чанков документа на стадии эмбеддингов. При chunk_size=1000 (~250 токенов
+    # по оценке батчера) 32 чанка почти заполняют embed_batch_tokens, а короткие порции
+    # (хвосты документов) батчер склеивает. Порции больше лимита он делит по токенам.
+    indexer_chunk_batch_size: int = Field(
+        default=32,
+        env="RAG_INDEXER_CHUNK_BATCH_SIZE"
+    )
+    indexer_embed_concurrency: int = Field(
+        default=8,
+        env="RAG_INDEXER_EMBED_CONCURRENCY"
+    )
+    embed_batch_tokens: int = Field(
+        default=8192,
+        env="RAG_EMBED_BATCH_TOKENS"
+    )
+    embed_batch_max_wait_ms: int = Field(
+        default=50,
+        env="RAG_EMBED_BATCH_MAX_WAIT_MS"
+    )
+    embedding_cache_enabled: bool = Field(
+        default=True,
+        env="RAG_EMBEDDING_CACHE_ENABLED"
+    )
+    embedding_cache_path: str = Field(
+        default=".cache/embeddings.sqlite3",
+        env="RAG_EMBEDDING_CACHE_PATH"
+    )
+    embedding_cache_max_entries: int = Field(
+        default=100_000,
+        env="RAG_EMBEDDING_CACHE_MAX_ENTRIES"
+    )
+    indexer_upsert_concurrency: int = Field(
+        default=4,
+        env="RAG_INDEXER_UPSERT_CONCURRENCY"
+    )
+
+    # Режим поиска по умолчанию: "dense", "sparse" (BM25) или "hybrid" (оба через RRF)
+    search_mode: Literal["dense", "sparse", "hybrid"] = Field(
+        default="hybrid",
+        env="RAG_SEARCH_MODE"
+    )
+    # Сколько кандидатов брать из каждой выдачи перед слиянием
+    hybrid_prefetch_limit: int = Field(
+        default=50,
+        env="RAG_HYBRID_PREFETCH_LIMIT"
+    )
+    rrf_k: int = Field(
+        default=60,
+        env="RAG_RRF_K"
+    )
+    bm25_k1: float = Field(
+        default=1.2,
+        env="RAG_BM25_K1"
+    )
+    bm25_b: float = Field(
+        default=0.75,
+        env="RAG_BM25_B"
+    )
+    # Средняя длина чанка в термах для нормировки BM25
+    bm25_avg_length: float = Field(
+        default=120,
+        env="RAG_BM25_AVG_LENGTH"
+    )
+    query_cache_enabled: bool = Field(
+        default=True,
+        env="RAG_QUERY_CACHE_ENABLED"
+    )
+    query_embedding_cache_size: int = Field(
+        default=1024,
+        env="RAG_QUERY_EMBEDDING_CACHE_SIZE"
+    )
+    query_embedding_cache_ttl: int = Field(
+        default=3600,
+        env="RAG_QUERY_EMBEDDING_CACHE_TTL"
+    )
+    search_result_cache_size: int = Field(
+        default=1024,
+        env="RAG_SEARCH_RESULT_CACHE_SIZE"
+    )
+    # Ограничивает устаревание выдачи, если документы переиндексировал другой процесс
+    search_result_cache_ttl: int = Field(
+        default=60,
+        env="RAG_SEARCH_RESULT_CACHE_TTL"
+    )
+    # Как часто перечитывать общую версию коллекции Qdrant, которую меняет индексатор.
+    # Столько же секунд может жить выдача после переиндексации в другом процессе.
+    collection_version_ttl: float = Field(
+        default=1.0,
+        env="RAG_COLLECTION_VERSION_TTL"
+    )
+    # Как часто перепроверять коллекцию Qdrant без разреженных BM25 векторов:
+    # qdrant_migration может добавить их уже после старта API
+    sparse_check_interval: float = Field(
+        default=30.0,
+        env="RAG_SPARSE_CHECK_INTERVAL"
+    )
+    # Хранилище векторов: "qdrant" (сервер) или "numpy" (встроенное, в файлах процесса)
+    vector_store: Literal["qdrant", "numpy"] = Field(
+        default="qdrant",
+        env="RAG_VECTOR_STORE"
+    )
+    # Каталог хранилища numpy. API и индексатор должны видеть один и тот же каталог
+    # (в docker-compose — общий том numpy_vectors), иначе API читает пустое хранилище.
+    numpy_store_path: str = Field(
+        default=".cache/vectors",
+        env="RAG_NUMPY_STORE_PATH"
+    )
+    numpy_store_dtype: Literal["float32", "float16"] = Field(
+        default="float32",
+        env="RAG_NUMPY_STORE_DTYPE"
+    )
+    # IVF индекс включается, когда в хранилище набирается numpy_ivf_min_points векторов
+    numpy_ivf_enabled: bool = Field(
+        default=False,
+        env="RAG_NUMPY_IVF_ENABLED"
+    )
+    numpy_ivf_min_points: int = Field(
+        default=50_000,
+        env="RAG_NUMPY_IVF_MIN_POINTS"
+    )
+    # 0 — взять корень из числа векторов
+    numpy_ivf_lists: int = Field(
+        default=0,
+        env="RAG_NUMPY_IVF_LISTS"
+    )
+    numpy_ivf_probes: int = Field(
+        default=8,
+        env="RAG_NUMPY_IVF_PROBES"
+    )
+    # Квантизация векторов в Qdrant: "none", "scalar" (int8) или "binary"
+    quantization: Literal["none", "scalar", "binary"] = Field(
+        default="none",
+        env="RAG_QUANTIZATION"
+    )
+    quantization_quantile: float = Field(
+        default=0.99,
+        env="RAG_QUANTIZATION_QUANTILE"
+    )
+    quantization_always_ram: bool = Field(
+        default=True,
+        env="RAG_QUANTIZATION_ALWAYS_RAM"
+    )
+    vectors_on_disk: bool = Field(
+        default=False,
+        env="RAG_VECTORS_ON_DISK"
+    )
+    search_rescore: bool = Field(
+        default=True,
+        env="RAG_SEARCH_RESCORE"
+    )
+    search_oversampling: float = Field(
+        default=2.0,
+        env="RAG_SEARCH_OVERSAMPLING"
+    )
+    # Переранжирование кандидатов кросс-энкодером после поиска
+    rerank_enabled: bool = Field(
+        default=False,
+        env="RAG_RERANK_ENABLED"
+    )
+    rerank_model: str = Field(
+        default="cross-encoder/mmarco-mMiniLMv2-L12-H384-v1",
+        env="RAG_RERANK_MODEL"
+    )
+    # Сколько кандидатов достать из хранилища для переранжирования
+    rerank_candidates: int = Field(
+        default=30,
+        env="RAG_RERANK_CANDIDATES"
+    )
+    rerank_batch_size: int = Field(
+        default=16,
+        env="RAG_RERANK_BATCH_SIZE"
+    )
+    # Бюджет на переранжирование всех запросов одного поиска, запросы, которые
+    # в него не уложились, сохраняют порядок поиска
+    rerank_budget_ms: int = Field(
+        default=300,
+        env="RAG_RERANK_BUDGET_MS"
+    )
+    rerank_cache_size: int = Field(
+        default=10_000,
+        env="RAG_RERANK_CACHE_SIZE"
+    )
+    rerank_cache_ttl: int = Field(
+        default=3600,
+        env="RAG_RERANK_CACHE_TTL"
+    )
+    # Материалы из документов пользователя при генерации уроков и блоков
+    generation_context_enabled: bool = Field(
+        default=True,
+        env="RAG_GENERATION_CONTEXT_ENABLED"
+    )
+    generation_context_chunks: int = Field(
+        default=12,
+        env="RAG_GENERATION_CONTEXT_CHUNKS"
+    )
+    # Бюджет токенов на материалы в промпте: вставленный пользователем текст и найденные чанки
+    generation_context_tokens: int = Field(
+        default=3000,
+        env="RAG_GENERATION_CONTEXT_TOKENS"
+    )
+    # Сколько асинхронных поисков процесс выполняет одновременно, остальные ждут в очереди
+    search_concurrency: int = Field(
+        default=32,
+        env="RAG_SEARCH_CONCURRENCY"
+    )
+    # Потоки для encode запросов, чтобы модель не блокировала event loop
+    search_encode_workers: int = Field(
+        default=2,
+        env="RAG_SEARCH_ENCODE_WORKERS"
+    )
+    # Общий таймаут асинхронного поиска в секундах, включая ожидание в очереди
+    search_timeout: float = Field(
+        default=15.0,
+        env="RAG_SEARCH_TIMEOUT"
+    )
 
 
 qdrant_settings = QdrantSettings()
@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -6,8 +7,22 @@ class S3Settings(BaseSettings):
     secret_key: str
     bucket_name: str
     endpoint_url: str
+    max_pool_connections: int = 20
+    keepalive_timeout: int = 30
+    connect_timeout: int = 5
+    read_timeout: int = 60
+    retry_max_attempts: int = 5
+    retry_mode: Literal["legacy", "standard", "adaptive"] = "standard"
+    download_chunk_size: int = 1024 * 1024
+    download_part_size: int = 8 * 1024 * 1024
+    download_concurrency: int = 4
+    download_spill_threshold: int = 32 * 1024 * 1024
+    download_spill_dir: str | None = None
+    # S3 требует части multipart upload не меньше 5 MB, кроме последней
+    upload_part_size: int = 8 * 1024 * 1024
+    upload_chunk_size: int = 1024 * 1024
 
     model_config = SettingsConfigDict(env_prefix="S3_")
 
 
-s3_settings = S3Settings()
\ No newline at end of file
+s3_settings = S3Settings()
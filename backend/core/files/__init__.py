@@ -1 +1 @@
-from .repository import FilesRepository, files_repository
+from .repository import FileTooLargeError, FilesRepository, file_too_large_message, files_repository
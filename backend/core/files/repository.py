@@ -1,5 +1,30 @@
+import asyncio
+import io
+import tempfile
+import time
+from contextlib import AsyncExitStack, asynccontextmanager, suppress
+from typing import AsyncIterator, BinaryIO
+
 import aioboto3
+from aiobotocore.config import AioConfig
+from core.configs.deployment import deployment_settings
 from core.configs.s3 import s3_settings
+from core.monitoring.files import S3_POOL_SATURATION, S3_REQUEST_DURATION, S3_REQUESTS_IN_PROGRESS
+
+
+class FileTooLargeError(Exception):
+
+    def __init__(self, max_size: int):
+        super().__init__(f"File exceeds {max_size} bytes")
+        self.max_size = max_size
+
+
+def file_too_large_message(max_size: int, file_size: int) -> str:
+    """Текст ошибки о превышении размера, который клиенты получают при загрузке"""
+    return (
+        f"File is too large. Maximum size: {max_size / (1024 * 1024):.2f}MB. "
+        f"Your file size: {file_size / (1024 * 1024):.2f}MB"
+    )
 
 
 class FilesRepository:
@@ -10,27 +35,167 @@ class FilesRepository:
         self.access_key = s3_settings.access_key
         self.secret_key = s3_settings.secret_key
         self.bucket_name = s3_settings.bucket_name
+        self.config = AioConfig(
+            max_pool_connections=s3_settings.max_pool_connections,
+            connect_timeout=s3_settings.connect_timeout,
+            read_timeout=s3_settings.read_timeout,
+            retries={
+                'max_attempts': s3_settings.retry_max_attempts,
+                'mode': s3_settings.retry_mode,
+            },
+            connector_args={'keepalive_timeout': s3_settings.keepalive_timeout},
+        )
+        self._s3_client = None
+        self._exit_stack: AsyncExitStack | None = None
+        self._in_progress = 0
 
-    async def upload_file(self, file_content: bytes, s3_path: str) -> None:
-        async with self.session.client(
+    async def start(self) -> None:
+        """Открыть долгоживущий клиент S3 с общим пулом соединений на время жизни приложения."""
+        if self._s3_client is not None:
+            return
+        self._exit_stack = AsyncExitStack()
+        self._s3_client = await self._exit_stack.enter_async_context(self._create_client())
+
+    async def close(self) -> None:
+        if self._exit_stack is not None:
+            await self._exit_stack.aclose()
+        self._exit_stack = None
+        self._s3_client = None
+
+    def _create_client(self):
+        return self.session.client(
             's3',
             endpoint_url=self.endpoint_url,
             aws_access_key_id=self.access_key,
-            aws_secret_access_key=self.secret_key
-        ) as s3_client:
+            aws_secret_access_key=self.secret_key,
+            config=self.config
+        )
+
+    @asynccontextmanager
+    async def _client(self):
+        if self._s3_client is not None:
+            yield self._s3_client
+            return
+        # Без start() (скрипты, тесты) клиент создается на один вызов
+        async with self._create_client() as s3_client:
+            yield s3_client
+
+    @asynccontextmanager
+    async def _track(self, operation: str):
+        service = deployment_settings.service_name
+        self._in_progress += 1
+        S3_REQUESTS_IN_PROGRESS.labels(service=service).set(self._in_progress)
+        S3_POOL_SATURATION.labels(service=service).set(self._in_progress / s3_settings.max_pool_connections)
+        status = "success"
+        start_time = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self._in_progress -= 1
+            S3_REQUESTS_IN_PROGRESS.labels(service=service).set(self._in_progress)
+            S3_POOL_SATURATION.labels(service=service).set(self._in_progress / s3_settings.max_pool_connections)
+            S3_REQUEST_DURATION.labels(service=service, operation=operation, status=status).observe(
+                time.perf_counter() - start_time
+            )
+
+    async def upload_file(self, file_content: bytes, s3_path: str) -> None:
+        async with self._client() as s3_client, self._track("put_object"):
             await s3_client.put_object(
                 Bucket=self.bucket_name,
                 Key=s3_path,
                 Body=file_content
             )
 
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        s3_path: str,
+        max_size: int | None = None
+    ) -> int:
+        """Загрузить поток в S3 по частям, не собирая файл в памяти целиком.
+
+        В памяти держится не больше одной части `upload_part_size`. Объекты меньше
+        одной части загружаются обычным put_object, крупнее — через multipart upload.
+        Если поток превысил `max_size`, загрузка прерывается с FileTooLargeError,
+        а начатый multipart upload отменяется. Возвращает размер загруженного файла.
+        """
+        part_size = s3_settings.upload_part_size
+        buffer = bytearray()
+        total_size = 0
+        upload_id = None
+        parts = []
+
+        async with self._client() as s3_client:
+            try:
+                async for chunk in chunks:
+                    total_size += len(chunk)
+                    if max_size is not None and total_size > max_size:
+                        raise FileTooLargeError(max_size)
+                    buffer.extend(chunk)
+
+                    while len(buffer) >= part_size:
+                        if upload_id is None:
+                            async with self._track("create_multipart_upload"):
+                                response = await s3_client.create_multipart_upload(
+                                    Bucket=self.bucket_name,
+                                    Key=s3_path
+                                )
+                            upload_id = response['UploadId']
+                        parts.append(await self._upload_part(
+                            s3_client, s3_path, upload_id, len(parts) + 1, bytes(buffer[:part_size])
+                        ))
+                        del buffer[:part_size]
+
+                if upload_id is None:
+                    async with self._track("put_object"):
+                        await s3_client.put_object(
+                            Bucket=self.bucket_name,
+                            Key=s3_path,
+                            Body=bytes(buffer)
+                        )
+                    return total_size
+
+                if buffer:
+                    parts.append(await self._upload_part(
+                        s3_client, s3_path, upload_id, len(parts) + 1, bytes(buffer)
+                    ))
+                async with self._track("complete_multipart_upload"):
+                    await s3_client.complete_multipart_upload(
+                        Bucket=self.bucket_name,
+                        Key=s3_path,
+                        UploadId=upload_id,
+                        MultipartUpload={'Parts': parts}
+                    )
+                return total_size
+            except BaseException:
+                if upload_id is not None:
+                    # Иначе загруженные части остаются в бакете и занимают место.
+                    # Ошибка отмены не должна скрывать исходную ошибку загрузки.
+                    with suppress(Exception):
+                        async with self._track("abort_multipart_upload"):
+                            await s3_client.abort_multipart_upload(
+                                Bucket=self.bucket_name,
+                                Key=s3_path,
+                                UploadId=upload_id
+                            )
+                raise
+
+    async def _upload_part(self, s3_client, s3_path: str, upload_id: str, part_number: int, body: bytes) -> dict:
+        async with self._track("upload_part"):
+            response = await s3_client.upload_part(
+                Bucket=self.bucket_name,
+                Key=s3_path,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=body
+            )
+        return {'ETag': response['ETag'], 'PartNumber': part_number}
+
     async def download_file(self, s3_path: str) -> bytes:
-        async with self.session.client(
-            's3',
-            endpoint_url=self.endpoint_url,
-            aws_access_key_id=self.access_key,
-            aws_secret_access_key=self.secret_key
-        ) as s3_client:
+        async with self._client() as s3_client, self._track("get_object"):
             response = await s3_client.get_object(
                 Bucket=self.bucket_name,
                 Key=s3_path
@@ -38,6 +203,84 @@ class FilesRepository:
             async with response['Body'] as stream:
                 return await stream.read()
 
+    async def iter_file(self, s3_path: str, chunk_size: int | None = None) -> AsyncIterator[bytes]:
+        """Читать объект из S3 потоком, не держа его целиком в памяти."""
+        chunk_size = chunk_size or s3_settings.download_chunk_size
+        async with self._client() as s3_client, self._track("get_object"):
+            response = await s3_client.get_object(
+                Bucket=self.bucket_name,
+                Key=s3_path
+            )
+            async with response['Body'] as stream:
+                while chunk := await stream.read(chunk_size):
+                    yield chunk
+
+    async def download_to_file(self, s3_path: str) -> BinaryIO:
+        """Скачать объект в файлоподобный буфер.
 
-files_repository = FilesRepository()
+        Небольшие объекты остаются в памяти, крупнее `download_spill_threshold`
+        пишутся во временный файл на диске. Большие объекты скачиваются
+        параллельными ranged GET запросами. Вызывающий код закрывает буфер сам,
+        временный файл удаляется при закрытии.
+        """
+        async with self._client() as s3_client:
+            async with self._track("head_object"):
+                head = await s3_client.head_object(Bucket=self.bucket_name, Key=s3_path)
+            size = head['ContentLength']
+
+            if size > s3_settings.download_spill_threshold:
+                buffer = tempfile.NamedTemporaryFile(
+                    prefix="s3-",
+                    dir=s3_settings.download_spill_dir,
+                    delete=True
+                )
+            else:
+                buffer = io.BytesIO()
+
+            try:
+                if size > s3_settings.download_part_size:
+                    await self._download_ranges(s3_client, s3_path, size, buffer)
+                else:
+                    async with self._track("get_object"):
+                        response = await s3_client.get_object(Bucket=self.bucket_name, Key=s3_path)
+                        async with response['Body'] as stream:
+                            while chunk := await stream.read(s3_settings.download_chunk_size):
+                                buffer.write(chunk)
+                buffer.flush()
+                buffer.seek(0)
+                return buffer
+            except BaseException:
+                buffer.close()
+                raise
 
+    async def _download_ranges(self, s3_client, s3_path: str, size: int, buffer: BinaryIO) -> None:
+        part_size = s3_settings.download_part_size
+        semaphore = asyncio.Semaphore(s3_settings.download_concurrency)
+
+        async def download_part(start: int) -> None:
+            end = min(start + part_size, size) - 1
+            async with semaphore, self._track("get_object_range"):
+                response = await s3_client.get_object(
+                    Bucket=self.bucket_name,
+                    Key=s3_path,
+                    Range=f"bytes={start}-{end}"
+                )
+                position = start
+                async with response['Body'] as stream:
+                    while chunk := await stream.read(s3_settings.download_chunk_size):
+                        # Между seek и write нет await, поэтому параллельные части не перемешиваются
+                        buffer.seek(position)
+                        buffer.write(chunk)
+                        position += len(chunk)
+
+        tasks = [asyncio.create_task(download_part(start)) for start in range(0, size, part_size)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+
+files_repository = FilesRepository()
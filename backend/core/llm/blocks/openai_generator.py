@@ -6,6 +6,9 @@ from pydantic import TypeAdapter
 
 from core.llm.openai_client import MonitoredOpenAIClient, get_monitored_openai_client
 from core.configs.llm import llm_settings
+from core.configs.rag import rag_settings
+from core.llm.rag.context import format_chunks, pack_chunks
+from core.llm.rag.tokens import estimate_prompt_tokens, truncate_to_prompt_tokens
 from .base_generator import BaseBlockGenerator
 from .prompts import MISTRAL_SINGLE_BLOCK_PROMPT
 from .schema import (
@@ -96,11 +99,16 @@ class OpenAIBlockGenerator(BaseBlockGenerator):
             next_content = json.dumps(context.next_block, ensure_ascii=False, indent=2)
             sections.append(f"\n# Следующий блок:\n{next_content}")
 
-        # Дополнительный контекст
+        # Дополнительный контекст, вставленный текст в приоритете перед найденными чанками
+        budget = rag_settings.generation_context_tokens
         if context.context:
-            sections.append(
-                f"\n# Дополнительный контекст/материалы:\n{context.context}"
-            )
+            pasted = truncate_to_prompt_tokens(context.context, budget)
+            budget -= estimate_prompt_tokens(pasted)
+            sections.append(f"\n# Дополнительный контекст/материалы:\n{pasted}")
+        if context.retrieved_chunks and budget > 0:
+            packed = format_chunks(pack_chunks(context.retrieved_chunks, budget))
+            if packed:
+                sections.append(f"\n# Выдержки из документов пользователя:\n{packed}")
 
         sections.append(
             "\n# Выведи строго JSON одного блока, соответствующий схеме ответа."
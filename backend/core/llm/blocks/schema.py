@@ -1,5 +1,6 @@
 from typing import Optional
 
+from core.llm.rag.base import DocumentChunk
 from courses.schema.blocks import LessonBlock
 from pydantic import BaseModel, Field
 
@@ -24,6 +25,10 @@ class LessonBlockGenerateContext(BaseModel):
         default=None,
         description="Конспект или материалы, на основе которых нужно создать/переформулировать блок",
     )
+    retrieved_chunks: list[DocumentChunk] = Field(
+        default_factory=list,
+        description="Чанки документов пользователя в порядке релевантности",
+    )
 
     # Соседние блоки для контекста
     previous_block: Optional[dict] = Field(
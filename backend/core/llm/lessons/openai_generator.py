@@ -4,6 +4,9 @@ import pydantic
 
 from core.llm.openai_client import MonitoredOpenAIClient, get_monitored_openai_client
 from core.configs.llm import llm_settings
+from core.configs.rag import rag_settings
+from core.llm.rag.context import format_chunks, pack_chunks
+from core.llm.rag.tokens import estimate_prompt_tokens, truncate_to_prompt_tokens
 from .base_generator import BaseLessonsGenerator
 from .schema import LessonBlocksGenerateContext, GeneratedLessonContent
 from .prompts import MISTRAL_LESSON_BLOCKS_PROMPT
@@ -49,8 +52,16 @@ class OpenAILessonsGenerator(BaseLessonsGenerator):
             sections.append(f"# Описание урока:\n{context.description}")
         if context.goal:
             sections.append(f"# Цель урока:\n{context.goal}")
+        # Вставленный текст и найденные чанки делят один бюджет, вставленный текст в приоритете
+        budget = rag_settings.generation_context_tokens
         if context.context:
-            sections.append(f"# Конспект/материалы:\n{context.context}")
+            pasted = truncate_to_prompt_tokens(context.context, budget)
+            budget -= estimate_prompt_tokens(pasted)
+            sections.append(f"# Конспект/материалы:\n{pasted}")
+        if context.retrieved_chunks and budget > 0:
+            packed = format_chunks(pack_chunks(context.retrieved_chunks, budget))
+            if packed:
+                sections.append(f"# Выдержки из документов пользователя:\n{packed}")
         if context.focus_points:
             focus_block = "\n".join(f"- {point}" for point in context.focus_points)
             sections.append(f"# Обязательные акценты:\n{focus_block}")
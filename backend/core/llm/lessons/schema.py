@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 
+from core.llm.rag.base import DocumentChunk
 from courses.schema.blocks import LessonBlock
 
 
@@ -14,6 +15,10 @@ class LessonBlocksGenerateContext(BaseModel):
         default=None,
         description="Ключевые аспекты, которые обязательно нужно раскрыть",
     )
+    retrieved_chunks: list[DocumentChunk] = Field(
+        default_factory=list,
+        description="Чанки документов пользователя в порядке релевантности",
+    )
 
 
 class GeneratedLessonContent(BaseModel):
@@ -30,6 +30,13 @@ OPENAI_REQUEST_DURATION = Histogram(
     buckets=[0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0],
 )
 
+OPENAI_PROMPT_TOKENS = Histogram(
+    "openai_prompt_tokens",
+    "Number of prompt tokens in one OpenAI API request",
+    ["service", "model", "task_type"],
+    buckets=[256, 512, 1024, 2048, 4096, 8192, 16384, 32768],
+)
+
 OPENAI_REQUEST_ERRORS = Counter(
     "openai_request_errors_total",
     "Total number of OpenAI API errors",
@@ -84,6 +91,11 @@ class MonitoredOpenAIClient:
                         token_type="prompt",
                         task_type=log_task_type
                     ).inc(usage.prompt_tokens)
+                    OPENAI_PROMPT_TOKENS.labels(
+                        service=self.service_name,
+                        model=self.model_name,
+                        task_type=log_task_type
+                    ).observe(usage.prompt_tokens)
 
                 if usage.completion_tokens:
                     OPENAI_TOKENS_USED.labels(
@@ -1,6 +1,9 @@
+import asyncio
+import hashlib
+import uuid
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Any, Literal
+from typing import Any, BinaryIO, Iterable, Iterator, Literal
 
 
 @dataclass(slots=True)
@@ -12,11 +15,163 @@ class DocumentChunk:
     metadata: dict[str, Any] | None = None
 
 
+@dataclass(slots=True)
+class DocumentPage:
+    content: str
+    metadata: dict[str, Any]
+
+
+@dataclass(slots=True)
+class PageSentences:
+    """Предложения страницы для семантического разбиения и их векторы, когда они посчитаны."""
+    page: DocumentPage
+    sentences: list[str]
+    embeddings: list[list[float]] | None = None
+
+
 DocumentExtension = Literal["pdf", "txt", "doc", "docx", "md"]
 
+DocumentSource = bytes | bytearray | memoryview | BinaryIO
+
+@dataclass(slots=True, frozen=True)
+class SearchFilter:
+    """Ограничение поиска по документам и владельцу. Пустой фильтр — вся коллекция."""
+    document_id: str | None = None
+    user_id: int | None = None
+    document_ids: tuple[str, ...] | None = None
+
+    @property
+    def documents(self) -> tuple[str, ...] | None:
+        """Документы, в которых разрешен поиск, или None, если ограничения нет."""
+        if self.document_id:
+            if self.document_ids is not None and self.document_id not in self.document_ids:
+                return ()
+            return (self.document_id,)
+        return self.document_ids
+
+
+# dense — по эмбеддингам, sparse — BM25 по термам, hybrid — обе выдачи, слитые через RRF
+SearchMode = Literal["dense", "sparse", "hybrid"]
+
+# Пространство имен для детерминированных идентификаторов чанков
+CHUNK_ID_NAMESPACE = uuid.UUID("5f0c7a8e-3c3b-4a51-9a8f-6f1f2f4c9b1d")
+
+
+def normalize_filters(filters: SearchFilter | list[SearchFilter] | None, count: int) -> list[SearchFilter]:
+    if filters is None:
+        return [SearchFilter()] * count
+    if isinstance(filters, SearchFilter):
+        return [filters] * count
+    if len(filters) != count:
+        raise ValueError(f"Expected {count} filters, got {len(filters)}")
+    return list(filters)
+
+
+def make_chunk_id(document_id: str, chunk_index: int, content: str) -> str:
+    """Идентификатор чанка, который не меняется при повторной индексации того же документа."""
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{document_id}:{chunk_index}:{content_hash}"))
+
 
 class RAGBase(ABC):
 
+    def warmup(self) -> None:
+        """Подготовить движок к работе (загрузка весов, прогрев). По умолчанию ничего не делает."""
+        pass
+
+    @abstractmethod
+    def iter_page_chunks(
+        self,
+        pages: Iterable[DocumentPage],
+        document_id: str,
+        user_id: int | None = None,
+        start_index: int = 0,
+    ) -> Iterator[DocumentChunk]:
+        """Разбить страницы документа на чанки без эмбеддингов, нумеруя их с `start_index`."""
+        pass
+
+    def iter_chunks(
+        self,
+        source: DocumentSource,
+        extension: DocumentExtension,
+        document_id: str | None = None,
+        user_id: int | None = None,
+    ) -> Iterator[DocumentChunk]:
+        """Лениво распарсить документ и отдавать его чанки без эмбеддингов."""
+        from .loaders import iter_pages
+
+        if document_id is None:
+            document_id = str(uuid.uuid4())
+        return self.iter_page_chunks(iter_pages(source, extension), str(document_id), user_id)
+
+    def split_pages(
+        self,
+        pages: Iterable[DocumentPage],
+        document_id: str,
+        user_id: int | None = None,
+        start_index: int = 0,
+    ) -> list[DocumentChunk]:
+        return list(self.iter_page_chunks(pages, document_id, user_id, start_index))
+
+    @property
+    def chunks_by_sentences(self) -> bool:
+        """Нужны ли чанкеру векторы предложений до разбиения на чанки."""
+        return False
+
+    def split_sentences(self, pages: Iterable[DocumentPage]) -> list[PageSentences]:
+        """Разбить страницы на предложения для чанкера, которому нужны их векторы."""
+        raise NotImplementedError
+
+    def split_sentence_pages(
+        self,
+        pages: Iterable[PageSentences],
+        document_id: str,
+        user_id: int | None = None,
+        start_index: int = 0,
+    ) -> list[DocumentChunk]:
+        """Собрать чанки из предложений с посчитанными векторами, нумеруя их с `start_index`."""
+        raise NotImplementedError
+
+    def split_document(
+        self,
+        source: DocumentSource,
+        extension: DocumentExtension,
+        document_id: str | None = None,
+        user_id: int | None = None,
+    ) -> list[DocumentChunk]:
+        """Распарсить документ и разбить его на чанки без эмбеддингов."""
+        return list(self.iter_chunks(source, extension, document_id, user_id))
+
+    @abstractmethod
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Посчитать эмбеддинги для набора текстов одним вызовом модели."""
+        pass
+
+    @abstractmethod
+    def upsert_chunks(self, chunks: list[DocumentChunk]) -> None:
+        """Записать чанки с посчитанными эмбеддингами в хранилище."""
+        pass
+
+    async def aupsert_chunks(self, chunks: list[DocumentChunk]) -> None:
+        """Асинхронная запись чанков. По умолчанию выполняет синхронную запись в отдельном потоке."""
+        await asyncio.to_thread(self.upsert_chunks, chunks)
+
+    @abstractmethod
+    def get_chunk_ids(self, document_id: str) -> set[str]:
+        """Вернуть идентификаторы всех чанков документа, которые уже лежат в хранилище."""
+        pass
+
+    async def aget_chunk_ids(self, document_id: str) -> set[str]:
+        return await asyncio.to_thread(self.get_chunk_ids, document_id)
+
+    @abstractmethod
+    def delete_document(self, document_id: str, keep_ids: set[str] | None = None) -> None:
+        """Удалить чанки документа, кроме перечисленных в `keep_ids`."""
+        pass
+
+    async def adelete_document(self, document_id: str, keep_ids: set[str] | None = None) -> None:
+        await asyncio.to_thread(self.delete_document, document_id, keep_ids)
+
     @abstractmethod
     def index_document(
         self,
@@ -28,5 +183,63 @@ class RAGBase(ABC):
         pass
 
     @abstractmethod
-    def search(self, query: str, k: int, document_id: str | None = None) -> list[DocumentChunk]:
+    def search(
+        self,
+        query: str,
+        k: int,
+        document_id: str | None = None,
+        user_id: int | None = None,
+        mode: SearchMode | None = None,
+        document_ids: list[str] | None = None,
+    ) -> list[DocumentChunk]:
+        """Найти `k` ближайших к запросу чанков, при необходимости только в документах или у пользователя.
+
+        Без `mode` используется режим из настроек `RAG_SEARCH_MODE`.
+        """
         pass
+
+    async def asearch(
+        self,
+        query: str,
+        k: int = 10,
+        document_id: str | None = None,
+        user_id: int | None = None,
+        mode: SearchMode | None = None,
+        document_ids: list[str] | None = None,
+    ) -> list[DocumentChunk]:
+        """Асинхронный поиск. По умолчанию выполняет синхронный поиск в отдельном потоке."""
+        return await asyncio.to_thread(self.search, query, k, document_id, user_id, mode, document_ids)
+
+    async def asearch_many(
+        self,
+        queries: list[str],
+        k: int = 10,
+        filters: SearchFilter | list[SearchFilter] | None = None,
+        mode: SearchMode | None = None,
+    ) -> list[list[DocumentChunk]]:
+        return await asyncio.to_thread(self.search_many, queries, k, filters, mode)
+
+    def search_many(
+        self,
+        queries: list[str],
+        k: int = 10,
+        filters: SearchFilter | list[SearchFilter] | None = None,
+        mode: SearchMode | None = None,
+    ) -> list[list[DocumentChunk]]:
+        """Выполнить несколько поисков сразу. Результаты идут в порядке запросов.
+
+        `filters` — общий фильтр для всех запросов или список по одному на запрос.
+        По умолчанию запросы выполняются по очереди.
+        """
+        filters = normalize_filters(filters, len(queries))
+        return [
+            self.search(
+                query,
+                k,
+                document_id=search_filter.document_id,
+                user_id=search_filter.user_id,
+                mode=mode,
+                document_ids=list(search_filter.document_ids) if search_filter.document_ids is not None else None,
+            )
+            for query, search_filter in zip(queries, filters)
+        ]
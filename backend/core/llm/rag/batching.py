@@ -0,0 +1,152 @@
+import asyncio
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Callable
+
+from loguru import logger
+
+from core.configs.deployment import deployment_settings
+from core.monitoring.rag import (
+    RAG_EMBED_BATCH_CHUNKS,
+    RAG_EMBED_BATCH_DURATION,
+    RAG_EMBED_BATCH_TOKENS,
+)
+from .tokens import estimate_tokens
+
+
+@dataclass(slots=True)
+class _EmbedRequest:
+    texts: list[str]
+    tokens: int
+    future: asyncio.Future
+
+
+class EmbeddingBatcher:
+    """Собирает чанки нескольких документов в один вызов модели эмбеддингов.
+
+    Запросы копятся, пока суммарное число токенов не достигнет `max_batch_tokens`
+    или пока с момента первого запроса в пачке не пройдет `max_wait_ms`.
+    Затем вся пачка кодируется одним вызовом `embed_fn`, а векторы
+    раздаются обратно вызывающим в исходном порядке. Запрос больше лимита
+    делится на части по `max_batch_tokens`, поэтому пачка не превышает лимит,
+    если в ней нет одного слишком длинного текста.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[list[str]], list[list[float]]],
+        max_batch_tokens: int,
+        max_wait_ms: int,
+        workers: int = 1,
+        executor: Executor | None = None,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+    ):
+        self.embed_fn = embed_fn
+        self.max_batch_tokens = max_batch_tokens
+        self.max_wait = max_wait_ms / 1000
+        self.workers = workers
+        self.executor = executor
+        self.count_tokens = count_tokens
+        self._queue: asyncio.Queue[_EmbedRequest] = asyncio.Queue()
+        self._carry: _EmbedRequest | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._run()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def _split(self, texts: list[str]) -> list[tuple[list[str], int]]:
+        """Порезать тексты подряд на части не больше `max_batch_tokens`."""
+        parts: list[tuple[list[str], int]] = []
+        part: list[str] = []
+        part_tokens = 0
+        for text in texts:
+            tokens = self.count_tokens(text)
+            if part and part_tokens + tokens > self.max_batch_tokens:
+                parts.append((part, part_tokens))
+                part, part_tokens = [], 0
+            part.append(text)
+            part_tokens += tokens
+        parts.append((part, part_tokens))
+        return parts
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """Посчитать эмбеддинги текстов в составе ближайших пачек."""
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        requests = [
+            _EmbedRequest(texts=part, tokens=tokens, future=loop.create_future())
+            for part, tokens in self._split(texts)
+        ]
+        for request in requests:
+            await self._queue.put(request)
+        # Дожидаемся всех частей, чтобы ошибка одной не оставила остальные без внимания
+        results = await asyncio.gather(*(request.future for request in requests), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return [embedding for result in results for embedding in result]
+
+    async def _next_request(self, timeout: float | None) -> _EmbedRequest | None:
+        if self._carry is not None:
+            request, self._carry = self._carry, None
+            return request
+        if timeout is None:
+            return await self._queue.get()
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout=max(timeout, 0))
+        except asyncio.TimeoutError:
+            return None
+
+    async def _collect_batch(self) -> list[_EmbedRequest]:
+        batch = [await self._next_request(timeout=None)]
+        tokens = batch[0].tokens
+        deadline = time.monotonic() + self.max_wait
+        while tokens < self.max_batch_tokens:
+            request = await self._next_request(timeout=deadline - time.monotonic())
+            if request is None:
+                break
+            if tokens + request.tokens > self.max_batch_tokens:
+                # Не раздуваем пачку сверх лимита: запрос уйдет первым в следующую
+                self._carry = request
+                break
+            batch.append(request)
+            tokens += request.tokens
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+            texts = [text for request in batch for text in request.texts]
+            start_time = time.perf_counter()
+            try:
+                embeddings = await loop.run_in_executor(self.executor, self.embed_fn, texts)
+            except Exception as e:
+                logger.exception(f"Failed to embed batch of {len(texts)} chunks: {str(e)}")
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+
+            RAG_EMBED_BATCH_DURATION.labels(service=deployment_settings.service_name).observe(
+                time.perf_counter() - start_time
+            )
+            RAG_EMBED_BATCH_CHUNKS.labels(service=deployment_settings.service_name).observe(len(texts))
+            RAG_EMBED_BATCH_TOKENS.labels(service=deployment_settings.service_name).observe(
+                sum(request.tokens for request in batch)
+            )
+
+            offset = 0
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_result(embeddings[offset:offset + len(request.texts)])
+                offset += len(request.texts)
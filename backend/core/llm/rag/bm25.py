@@ -0,0 +1,76 @@
+import re
+import zlib
+from collections import Counter
+
+# Буквенно-цифровые слова, плюс одиночные символы формул вроде ∫, ∑, √
+TOKEN_PATTERN = re.compile(r"\w+|[∫∑∏√∂∇∞≈≠≤≥±∈∉⊂∪∩→⇒⇔]")
+
+STOP_WORDS = frozenset(
+    "и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по только ее мне "
+    "было вот от меня еще нет о из ему теперь когда даже ну вдруг ли если уже или ни быть был него до "
+    "вас нибудь опять уж вам ведь там потом себя ничего ей может они тут где есть надо ней для мы тебя "
+    "их чем была сам чтоб без будто чего раз тоже себе под будет ж тогда кто этот того потому этого "
+    "какой совсем ним здесь этом один почти мой тем чтобы нее были куда зачем всех никогда можно при "
+    "об это эта эти также "
+    "the a an and or of to in on at for is are was were be by with as from that this it its".split()
+)
+
+# Окончания русских словоформ, от длинных к коротким. Легкий стемминг сводит
+# «производная», «производной», «производную» к одной основе без словарей.
+RUSSIAN_ENDINGS = sorted(
+    (
+        "ами ями ого его ому ему ыми ими ая яя ое ее ые ие ой ей ий ый ую юю ом ем ам ям ах ях "
+        "ов ев ию ия ья ье ьи ы и а я о е у ю ь"
+    ).split(),
+    key=len,
+    reverse=True,
+)
+MIN_STEM_LENGTH = 4
+
+
+def stem(token: str) -> str:
+    if not re.match(r"[а-я]", token):
+        return token
+    for ending in RUSSIAN_ENDINGS:
+        if token.endswith(ending) and len(token) - len(ending) >= MIN_STEM_LENGTH:
+            return token[:-len(ending)]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    """Разбить текст на нормализованные термы для лексического поиска."""
+    tokens = TOKEN_PATTERN.findall(text.lower().replace("ё", "е"))
+    return [stem(token) for token in tokens if token not in STOP_WORDS]
+
+
+def term_id(term: str) -> int:
+    # Индексы разреженного вектора в Qdrant — uint32
+    return zlib.crc32(term.encode("utf-8"))
+
+
+def document_sparse_vector(
+    text: str,
+    avg_length: float,
+    k1: float = 1.2,
+    b: float = 0.75,
+) -> tuple[list[int], list[float]]:
+    """TF-часть BM25 для документа. IDF по коллекции досчитывает хранилище при поиске."""
+    terms = tokenize(text)
+    if not terms:
+        return [], []
+    length_norm = k1 * (1 - b + b * len(terms) / avg_length)
+    weights: dict[int, float] = {}
+    for term, count in Counter(terms).items():
+        index = term_id(term)
+        weights[index] = weights.get(index, 0.0) + count * (k1 + 1) / (count + length_norm)
+    return list(weights), list(weights.values())
+
+
+def query_sparse_vector(text: str) -> tuple[list[int], list[float]]:
+    indices = sorted({term_id(term) for term in tokenize(text)})
+    return indices, [1.0] * len(indices)
+
+
+def hashed_terms(text: str) -> list[str]:
+    """Термы в виде hex-идентификаторов: ASCII-токены для полнотекстовых индексов."""
+    return [format(term_id(term), "x") for term in tokenize(text)]
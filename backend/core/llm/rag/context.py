@@ -0,0 +1,58 @@
+from .base import DocumentChunk
+from .tokens import estimate_prompt_tokens
+
+# Более короткое совпадение конца и начала соседних чанков считаем случайным
+MIN_OVERLAP_CHARS = 20
+# Заголовок «[Документ …, стр. …]» и разделители фрагмента
+PASSAGE_OVERHEAD_TOKENS = 16
+
+
+def _chunk_position(chunk: DocumentChunk) -> tuple[str, int]:
+    return str(chunk.document_id), (chunk.metadata or {}).get("chunk_index", 0)
+
+
+def _strip_overlap(previous: str, current: str) -> str:
+    """Убрать из начала чанка текст, которым он перекрывается с предыдущим."""
+    for size in range(min(len(previous), len(current)), MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(current[:size]):
+            return current[size:]
+    return "\n" + current
+
+
+def pack_chunks(chunks: list[DocumentChunk], max_tokens: int) -> list[DocumentChunk]:
+    """Отобрать чанки в бюджет токенов и вернуть их в порядке чтения.
+
+    Чанки берутся в порядке релевантности, повторы по идентификатору и тексту
+    пропускаются. Чанк, который не помещается целиком, пропускается, но более
+    короткие после него еще могут попасть в бюджет.
+    """
+    seen: set[str] = set()
+    selected = []
+    used = 0
+    for chunk in chunks:
+        text = " ".join(chunk.content.split())
+        if not text or chunk.id in seen or text in seen:
+            continue
+        tokens = estimate_prompt_tokens(chunk.content) + PASSAGE_OVERHEAD_TOKENS
+        if used + tokens > max_tokens:
+            continue
+        seen.update((chunk.id, text))
+        selected.append(chunk)
+        used += tokens
+    return sorted(selected, key=_chunk_position)
+
+
+def format_chunks(chunks: list[DocumentChunk]) -> str:
+    """Склеить соседние чанки документа в один фрагмент без повторов перекрытия."""
+    passages: list[str] = []
+    previous = None
+    for chunk in chunks:
+        document_id, index = _chunk_position(chunk)
+        if previous is not None and _chunk_position(previous) == (document_id, index - 1):
+            passages[-1] += _strip_overlap(previous.content, chunk.content)
+        else:
+            page = (chunk.metadata or {}).get("page_label")
+            source = f"[Документ {document_id}, стр. {page}]" if page else f"[Документ {document_id}]"
+            passages.append(f"{source}\n{chunk.content}")
+        previous = chunk
+    return "\n\n".join(passages)
@@ -0,0 +1,29 @@
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from core.configs.rag import rag_settings
+
+
+def get_embedding_model_id() -> str:
+    """Идентификатор модели с учетом бэкенда, векторы разных бэкендов различаются в пределах допуска."""
+    if rag_settings.embedding_backend == "torch":
+        return rag_settings.model_name
+    return f"{rag_settings.model_name}@onnx:{rag_settings.embedding_onnx_file}"
+
+
+def create_embedder() -> HuggingFaceEmbeddings:
+    """Создать модель эмбеддингов на выбранном в настройках бэкенде.
+
+    ONNX бэкенд использует поддержку ONNX Runtime в sentence-transformers и
+    требует optimum[onnxruntime] из группы зависимостей onnx
+    (`uv sync --group onnx`).
+    """
+    if rag_settings.embedding_backend == "torch":
+        return HuggingFaceEmbeddings(model_name=rag_settings.model_name)
+
+    return HuggingFaceEmbeddings(
+        model_name=rag_settings.embedding_onnx_path or rag_settings.model_name,
+        model_kwargs={
+            "backend": "onnx",
+            "model_kwargs": {"file_name": rag_settings.embedding_onnx_file},
+        },
+    )
@@ -0,0 +1,115 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+
+from core.configs.deployment import deployment_settings
+from core.monitoring.rag import (
+    RAG_EMBEDDING_CACHE_ENTRIES,
+    RAG_EMBEDDING_CACHE_EVICTIONS,
+    RAG_EMBEDDING_CACHE_HITS,
+    RAG_EMBEDDING_CACHE_MISSES,
+)
+
+
+class EmbeddingCache:
+    """Персистентный кэш эмбеддингов на SQLite.
+
+    Ключ — sha256 от имени модели и текста чанка, поэтому одинаковые фрагменты
+    повторно загруженных документов не пересчитываются. Размер ограничен
+    `max_entries`: при переполнении удаляются записи, к которым дольше всего
+    не обращались.
+    """
+
+    def __init__(self, path: str, model_name: str, max_entries: int):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_embeddings_accessed_at ON embeddings (accessed_at)"
+        )
+        self._connection.commit()
+        self._size = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._update_size_metric()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _update_size_metric(self) -> None:
+        RAG_EMBEDDING_CACHE_ENTRIES.labels(service=deployment_settings.service_name).set(self._size)
+
+    def get_many(self, texts: list[str]) -> list[list[float] | None]:
+        """Вернуть закэшированные векторы в порядке текстов, None для промахов."""
+        if not texts:
+            return []
+        keys = [self._key(text) for text in texts]
+        unique_keys = list(dict.fromkeys(keys))
+        found: dict[str, list[float]] = {}
+        with self._lock:
+            # SQLite ограничивает число параметров в запросе, поэтому читаем порциями
+            for start in range(0, len(unique_keys), 500):
+                part = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+                if rows:
+                    self._connection.execute(
+                        f"UPDATE embeddings SET accessed_at = ? WHERE key IN ({placeholders})",
+                        [time.time(), *part],
+                    )
+            self._connection.commit()
+
+        result = [found.get(key) for key in keys]
+        hits = sum(vector is not None for vector in result)
+        RAG_EMBEDDING_CACHE_HITS.labels(service=deployment_settings.service_name).inc(hits)
+        RAG_EMBEDDING_CACHE_MISSES.labels(service=deployment_settings.service_name).inc(len(result) - hits)
+        return result
+
+    def put_many(self, texts: list[str], vectors: list[list[float]]) -> None:
+        if not texts:
+            return
+        now = time.time()
+        rows = [
+            (self._key(text), array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            cursor = self._connection.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, accessed_at) VALUES (?, ?, ?)", rows
+            )
+            self._size += max(cursor.rowcount, 0)
+            self._evict()
+            self._connection.commit()
+        self._update_size_metric()
+
+    def _evict(self) -> None:
+        overflow = self._size - self.max_entries
+        if overflow <= 0:
+            return
+        cursor = self._connection.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            "SELECT key FROM embeddings ORDER BY accessed_at LIMIT ?)",
+            (overflow,),
+        )
+        self._size -= cursor.rowcount
+        RAG_EMBEDDING_CACHE_EVICTIONS.labels(service=deployment_settings.service_name).inc(cursor.rowcount)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,170 @@
+import asyncio
+import io
+import multiprocessing
+import sys
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import AsyncIterator, BinaryIO, Iterator
+
+from .base import DocumentExtension, DocumentPage, DocumentSource
+from .loaders import count_pdf_pages, iter_pages, iter_pdf_pages
+
+
+# Как передать документ в процесс-воркер: через общую память или по пути к файлу на диске
+SourceRef = tuple[str, str, int]
+
+
+def attach_shared_memory(name: str) -> SharedMemory:
+    """Подключиться к сегменту родителя, не беря на себя его удаление.
+
+    Сегмент удаляет только родитель в `PageExtractor._share`.
+    """
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+    shm = SharedMemory(name=name)
+    # До 3.13 подключение регистрирует сегмент в resource tracker. Свой tracker воркера
+    # (запущенный им самим, _pid не None) при выходе воркера удалил бы сегмент раньше
+    # родителя и предупредил об утечке, поэтому регистрацию снимаем. С унаследованным
+    # tracker родителя повторная регистрация ничего не меняет, а снятие удалило бы
+    # регистрацию родителя.
+    if resource_tracker._resource_tracker._pid is not None:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+@contextmanager
+def open_source_ref(ref: SourceRef) -> Iterator[BinaryIO]:
+    kind, location, size = ref
+    if kind == "path":
+        with open(location, "rb") as stream:
+            yield stream
+        return
+
+    shm = attach_shared_memory(location)
+    try:
+        stream = io.BytesIO(shm.buf[:size])
+    finally:
+        shm.close()
+    yield stream
+
+
+def extract_page_count(ref: SourceRef) -> int:
+    with open_source_ref(ref) as stream:
+        return count_pdf_pages(stream)
+
+
+def extract_pdf_page_range(ref: SourceRef, start: int, stop: int) -> list[DocumentPage]:
+    with open_source_ref(ref) as stream:
+        return list(iter_pdf_pages(stream, start, stop))
+
+
+class PageExtractor:
+    """Извлечение текста документов в пуле процессов.
+
+    Парсинг PDF в pypdf — чистый Python и упирается в GIL, поэтому он выносится
+    в отдельные процессы. Большие PDF делятся на диапазоны страниц, которые
+    извлекаются параллельно, а результаты отдаются строго по порядку страниц.
+    В работе одновременно не больше `workers` диапазонов одного документа:
+    следующий отправляется, только когда потребитель забрал готовый, поэтому
+    память не растет с числом страниц и один большой PDF не занимает весь пул.
+    Остальные форматы и все документы при `workers=0` читаются генератором
+    в потоке текущего процесса.
+    """
+
+    def __init__(self, workers: int, pages_per_task: int):
+        self.workers = workers
+        self.pages_per_task = pages_per_task
+        self.executor: Executor
+        if workers > 0:
+            # spawn вместо fork: родительский процесс уже держит потоки torch
+            self.executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="indexer-extract")
+        self.thread_executor = ThreadPoolExecutor(
+            max_workers=max(workers, 1),
+            thread_name_prefix="indexer-extract-stream",
+        )
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.thread_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _iter_streamed(
+        self,
+        source: DocumentSource,
+        extension: DocumentExtension,
+    ) -> AsyncIterator[list[DocumentPage]]:
+        """Читать страницы генератором, по `pages_per_task` за раз."""
+        loop = asyncio.get_running_loop()
+        pages = iter_pages(source, extension)
+        while True:
+            batch = await loop.run_in_executor(self.thread_executor, list, islice(pages, self.pages_per_task))
+            if not batch:
+                return
+            yield batch
+
+    @contextmanager
+    def _share(self, source: DocumentSource) -> Iterator[SourceRef]:
+        path = getattr(source, "name", None)
+        if isinstance(path, str):
+            yield ("path", path, 0)
+            return
+
+        if not isinstance(source, (bytes, bytearray, memoryview)):
+            source.seek(0)
+            source = source.read()
+        size = len(source)
+        shm = SharedMemory(create=True, size=max(size, 1))
+        try:
+            shm.buf[:size] = source
+            yield ("shm", shm.name, size)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    async def iter_page_batches(
+        self,
+        source: DocumentSource,
+        extension: DocumentExtension,
+    ) -> AsyncIterator[list[DocumentPage]]:
+        """Отдавать страницы документа порциями в порядке следования."""
+        loop = asyncio.get_running_loop()
+
+        if self.workers == 0 or extension != "pdf":
+            async for pages in self._iter_streamed(source, extension):
+                yield pages
+            return
+
+        with self._share(source) as ref:
+            page_count = await loop.run_in_executor(self.executor, extract_page_count, ref)
+            starts = iter(range(0, page_count, self.pages_per_task))
+            in_flight: deque[asyncio.Future] = deque()
+
+            def submit_next() -> None:
+                start = next(starts, None)
+                if start is not None:
+                    in_flight.append(loop.run_in_executor(
+                        self.executor,
+                        extract_pdf_page_range,
+                        ref,
+                        start,
+                        min(start + self.pages_per_task, page_count),
+                    ))
+
+            for _ in range(self.workers):
+                submit_next()
+            try:
+                while in_flight:
+                    pages = await in_flight.popleft()
+                    submit_next()
+                    yield pages
+            finally:
+                # Общая память удаляется на выходе, поэтому ждем задачи в работе, даже если чтение прервали
+                await asyncio.gather(*in_flight, return_exceptions=True)
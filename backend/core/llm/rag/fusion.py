@@ -0,0 +1,17 @@
+from .base import DocumentChunk
+
+
+def reciprocal_rank_fusion(rankings: list[list[DocumentChunk]], limit: int, rrf_k: int = 60) -> list[DocumentChunk]:
+    """Объединить несколько выдач по RRF: score = sum(1 / (rrf_k + rank)).
+
+    Сырые оценки разных поисков несравнимы между собой, а ранги сравнимы,
+    поэтому чанк, стоящий высоко в обеих выдачах, поднимается наверх.
+    """
+    scores: dict[str, float] = {}
+    chunks: dict[str, DocumentChunk] = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking, start=1):
+            scores[chunk.id] = scores.get(chunk.id, 0.0) + 1.0 / (rrf_k + rank)
+            chunks.setdefault(chunk.id, chunk)
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    return [chunks[chunk_id] for chunk_id in ordered[:limit]]
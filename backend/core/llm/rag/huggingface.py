@@ -0,0 +1,478 @@
+import asyncio
+import time
+import uuid
+from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Hashable, Iterable, Iterator
+
+import psutil
+from loguru import logger
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from core.configs.deployment import deployment_settings
+from core.configs.rag import rag_settings
+from core.monitoring.rag import (
+    RAG_CHUNK_TOKENS,
+    RAG_CHUNKS_TRUNCATED,
+    RAG_MODEL_LOAD_SECONDS,
+    RAG_MODEL_MEMORY_BYTES,
+    RAG_MODEL_WARMUP_SECONDS,
+    RAG_TRUNCATED_TOKENS,
+)
+from .base import (
+    RAGBase,
+    DocumentChunk,
+    DocumentExtension,
+    DocumentPage,
+    PageSentences,
+    SearchFilter,
+    SearchMode,
+    make_chunk_id,
+    normalize_filters,
+)
+from .embedders import create_embedder, get_embedding_model_id
+from .embedding_cache import EmbeddingCache
+from .query_cache import QueryCache
+from .reranker import CrossEncoderReranker
+from .semantic_chunker import SemanticChunker
+from .tokens import TokenCounter
+
+
+class HuggingFaceRAG(RAGBase):
+    """Общая часть движков на модели HuggingFace: разбиение на чанки, эмбеддинги и кэши.
+
+    Наследники реализуют только хранение векторов и сам поиск в `_search_many`.
+    """
+
+    def __init__(self):
+        self.embedder = self._get_embedder()
+        self.embedding_cache = self._init_embedding_cache()
+        # _client — SentenceTransformer внутри обертки langchain
+        self.token_counter = TokenCounter(self.embedder._client)
+        self.text_splitter = self._init_text_splitter()
+        self.semantic_chunker = self._init_semantic_chunker()
+        self.query_cache = self._init_query_cache()
+        self.reranker = self._init_reranker()
+        self.search_executor = ThreadPoolExecutor(
+            max_workers=rag_settings.search_encode_workers,
+            thread_name_prefix="rag-search",
+        )
+        self.search_semaphore = asyncio.Semaphore(rag_settings.search_concurrency)
+
+    def _get_embedder(self) -> HuggingFaceEmbeddings:
+        model_name = get_embedding_model_id()
+        process = psutil.Process()
+        rss_before = process.memory_info().rss
+        start_time = time.perf_counter()
+        embedder = create_embedder()
+        RAG_MODEL_LOAD_SECONDS.labels(
+            service=deployment_settings.service_name, model=model_name
+        ).set(time.perf_counter() - start_time)
+        RAG_MODEL_MEMORY_BYTES.labels(
+            service=deployment_settings.service_name, model=model_name
+        ).set(max(process.memory_info().rss - rss_before, 0))
+        return embedder
+
+    def _init_embedding_cache(self) -> EmbeddingCache | None:
+        if not rag_settings.embedding_cache_enabled:
+            return None
+        return EmbeddingCache(
+            path=rag_settings.embedding_cache_path,
+            model_name=get_embedding_model_id(),
+            max_entries=rag_settings.embedding_cache_max_entries,
+        )
+
+    def _init_query_cache(self) -> QueryCache | None:
+        if not rag_settings.query_cache_enabled:
+            return None
+        return QueryCache(
+            embedding_size=rag_settings.query_embedding_cache_size,
+            embedding_ttl=rag_settings.query_embedding_cache_ttl,
+            result_size=rag_settings.search_result_cache_size,
+            result_ttl=rag_settings.search_result_cache_ttl,
+        )
+
+    def _chunk_tokens(self) -> int:
+        if not rag_settings.chunk_tokens:
+            return self.token_counter.window
+        if rag_settings.chunk_tokens > self.token_counter.window:
+            logger.warning(
+                f"RAG_CHUNK_TOKENS={rag_settings.chunk_tokens} exceeds the model window "
+                f"of {self.token_counter.window} tokens, chunks will be truncated on encode"
+            )
+        return rag_settings.chunk_tokens
+
+    def _init_text_splitter(self) -> RecursiveCharacterTextSplitter:
+        if rag_settings.chunk_unit == "tokens":
+            return RecursiveCharacterTextSplitter(
+                chunk_size=self._chunk_tokens(),
+                chunk_overlap=rag_settings.chunk_overlap_tokens,
+                length_function=self.token_counter,
+            )
+        return RecursiveCharacterTextSplitter(
+            chunk_size=rag_settings.chunk_size,
+            chunk_overlap=rag_settings.chunk_overlap,
+            length_function=len,
+        )
+
+    def _init_semantic_chunker(self) -> SemanticChunker | None:
+        if rag_settings.chunker != "semantic":
+            return None
+        # Предложения кодируются через кэш эмбеддингов, повторная индексация их не пересчитывает
+        if rag_settings.chunk_unit == "tokens":
+            return SemanticChunker(
+                encode=self.embed_texts,
+                count_tokens=self.token_counter,
+                window=self.token_counter.window,
+                max_size=self._chunk_tokens(),
+                min_size=rag_settings.semantic_min_chunk_tokens,
+                breakpoint_percentile=rag_settings.semantic_breakpoint_percentile,
+                length_function=self.token_counter,
+            )
+        return SemanticChunker(
+            encode=self.embed_texts,
+            count_tokens=self.token_counter,
+            window=self.token_counter.window,
+            max_size=rag_settings.chunk_size,
+            min_size=rag_settings.semantic_min_chunk_size,
+            breakpoint_percentile=rag_settings.semantic_breakpoint_percentile,
+        )
+
+    def _init_reranker(self) -> CrossEncoderReranker | None:
+        if not rag_settings.rerank_enabled:
+            return None
+        return CrossEncoderReranker(
+            model_name=rag_settings.rerank_model,
+            batch_size=rag_settings.rerank_batch_size,
+            budget_ms=rag_settings.rerank_budget_ms,
+            cache_size=rag_settings.rerank_cache_size,
+            cache_ttl=rag_settings.rerank_cache_ttl,
+        )
+
+    def warmup(self) -> None:
+        """Прогнать тестовый encode, чтобы первый документ не платил за ленивую инициализацию модели."""
+        start_time = time.perf_counter()
+        self.embedder.embed_query(rag_settings.warmup_text)
+        RAG_MODEL_WARMUP_SECONDS.labels(
+            service=deployment_settings.service_name, model=get_embedding_model_id()
+        ).set(time.perf_counter() - start_time)
+        if self.reranker is not None:
+            self.reranker.warmup(rag_settings.warmup_text)
+
+    def iter_page_chunks(
+        self,
+        pages: Iterable[DocumentPage],
+        document_id: str,
+        user_id: int | None = None,
+        start_index: int = 0,
+    ) -> Iterator[DocumentChunk]:
+        # Страницы режутся по одной, поэтому в памяти не держится весь документ
+        if self.semantic_chunker is not None:
+            yield from self._iter_sentence_chunks(self._iter_encoded_sentences(pages), document_id, user_id, start_index)
+            return
+        chunk_index = start_index
+        for page in pages:
+            pieces = [(content, None) for content in self.text_splitter.split_text(page.content)]
+            chunks = self._page_chunks(page, pieces, document_id, user_id, chunk_index)
+            chunk_index += len(chunks)
+            yield from chunks
+
+    @property
+    def chunks_by_sentences(self) -> bool:
+        return self.semantic_chunker is not None
+
+    def split_sentences(self, pages: Iterable[DocumentPage]) -> list[PageSentences]:
+        return [PageSentences(page=page, sentences=self.semantic_chunker.sentences(page.content)) for page in pages]
+
+    def split_sentence_pages(
+        self,
+        pages: Iterable[PageSentences],
+        document_id: str,
+        user_id: int | None = None,
+        start_index: int = 0,
+    ) -> list[DocumentChunk]:
+        return list(self._iter_sentence_chunks(pages, document_id, user_id, start_index))
+
+    def _iter_encoded_sentences(self, pages: Iterable[DocumentPage]) -> Iterator[PageSentences]:
+        # Вне конвейера индексации предложения кодируются здесь же, постранично
+        for page in pages:
+            for item in self.split_sentences([page]):
+                item.embeddings = self.embed_texts(item.sentences)
+                yield item
+
+    def _iter_sentence_chunks(
+        self,
+        pages: Iterable[PageSentences],
+        document_id: str,
+        user_id: int | None,
+        start_index: int,
+    ) -> Iterator[DocumentChunk]:
+        # Векторы чанков собираются из векторов предложений, отдельно чанки не кодируются
+        chunk_index = start_index
+        for item in pages:
+            pieces = [
+                (chunk.content, chunk.embedding)
+                for chunk in self.semantic_chunker.group(item.sentences, item.embeddings or [])
+            ]
+            chunks = self._page_chunks(item.page, pieces, document_id, user_id, chunk_index)
+            chunk_index += len(chunks)
+            yield from chunks
+
+    def _page_chunks(
+        self,
+        page: DocumentPage,
+        pieces: list[tuple[str, list[float] | None]],
+        document_id: str,
+        user_id: int | None,
+        start_index: int,
+    ) -> list[DocumentChunk]:
+        """Чанки страницы из текстов и их векторов, если чанкер уже их посчитал."""
+        self._observe_chunk_tokens([content for content, _ in pieces])
+        chunks = []
+        for chunk_index, (content, embedding) in enumerate(pieces, start=start_index):
+            metadata = dict(page.metadata)
+            metadata["document_id"] = document_id
+            metadata["chunk_index"] = chunk_index
+            if user_id is not None:
+                metadata["user_id"] = user_id
+            chunks.append(DocumentChunk(
+                id=make_chunk_id(document_id, chunk_index, content),
+                document_id=document_id,
+                content=content,
+                embedding=embedding,
+                metadata=metadata,
+            ))
+        return chunks
+
+    def _observe_chunk_tokens(self, contents: list[str]) -> None:
+        """Размеры чанков в токенах модели и сколько токенов модель отрежет по окну."""
+        service = deployment_settings.service_name
+        window = self.token_counter.window
+        truncated = dropped = 0
+        for tokens in self.token_counter.count_many(contents):
+            RAG_CHUNK_TOKENS.labels(service=service).observe(tokens)
+            if tokens > window:
+                truncated += 1
+                dropped += tokens - window
+        if truncated:
+            RAG_CHUNKS_TRUNCATED.labels(service=service).inc(truncated)
+            RAG_TRUNCATED_TOKENS.labels(service=service).inc(dropped)
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        if self.embedding_cache is None:
+            return self.embedder.embed_documents(texts)
+
+        # Считаем только те чанки, которых еще нет в кэше
+        embeddings = self.embedding_cache.get_many(texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            computed = self.embedder.embed_documents(missing_texts)
+            self.embedding_cache.put_many(missing_texts, computed)
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+        return embeddings
+
+    def index_document(
+        self,
+        document_bytes: bytes,
+        extension: DocumentExtension,
+        document_id: str | None = None,
+        user_id: int | None = None,
+    ) -> bool:
+        if document_id is None:
+            document_id = str(uuid.uuid4())
+        chunks = self.split_document(document_bytes, extension, document_id, user_id)
+        chunk_ids = {chunk.id for chunk in chunks}
+        existing_ids = self.get_chunk_ids(document_id)
+
+        # Идентификаторы детерминированы, поэтому совпавшие чанки уже лежат в коллекции как есть
+        new_chunks = [chunk for chunk in chunks if chunk.id not in existing_ids]
+        # Семантический чанкер уже посчитал векторы, кодируем только чанки без них
+        missing = [chunk for chunk in new_chunks if chunk.embedding is None]
+        embeddings = self.embed_texts([chunk.content for chunk in missing])
+        for chunk, embedding in zip(missing, embeddings):
+            chunk.embedding = embedding
+        self.upsert_chunks(new_chunks)
+
+        # Старые точки удаляем только после записи новых, чтобы документ не пропадал из поиска
+        if existing_ids - chunk_ids:
+            self.delete_document(document_id, keep_ids=chunk_ids)
+        return True
+
+    def embed_query(self, query: str) -> list[float]:
+        if self.query_cache is None:
+            return self.embedder.embed_query(query)
+        return self.query_cache.embed_query(query, self.embedder.embed_query)
+
+    def embed_queries(self, queries: list[str]) -> list[list[float]]:
+        if not queries:
+            return []
+        if self.query_cache is None:
+            return self.embedder.embed_documents(queries)
+        return self.query_cache.embed_queries(queries, self.embedder.embed_documents)
+
+    async def aembed_queries(self, queries: list[str]) -> list[list[float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.search_executor, self.embed_queries, queries)
+
+    def invalidate_search_cache(self) -> None:
+        """Сбросить кэш выдач после записи или удаления чанков."""
+        if self.query_cache is not None:
+            self.query_cache.invalidate()
+
+    def collection_version(self) -> Hashable:
+        """Версия коллекции для ключа кэша выдач. По умолчанию считается записями этого процесса."""
+        return self.query_cache.version if self.query_cache is not None else 0
+
+    async def acollection_version(self) -> Hashable:
+        return self.collection_version()
+
+    @staticmethod
+    def _make_filter(
+        document_id: str | None,
+        user_id: int | None,
+        document_ids: list[str] | None,
+    ) -> SearchFilter:
+        return SearchFilter(
+            document_id=str(document_id) if document_id else None,
+            user_id=user_id,
+            document_ids=tuple(str(document_id) for document_id in document_ids) if document_ids is not None else None,
+        )
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        document_id: str | None = None,
+        user_id: int | None = None,
+        mode: SearchMode | None = None,
+        document_ids: list[str] | None = None,
+    ) -> list[DocumentChunk]:
+        search_filter = self._make_filter(document_id, user_id, document_ids)
+        return self.search_many([query], k, search_filter, mode)[0]
+
+    def _cached_results(
+        self,
+        queries: list[str],
+        k: int,
+        filters: list[SearchFilter],
+        mode: SearchMode,
+        version: Hashable,
+    ) -> tuple[list[str] | None, list[list[DocumentChunk] | None]]:
+        """Ключи кэша и найденные в нем выдачи, None на месте промахов."""
+        if self.query_cache is None:
+            return None, [None] * len(queries)
+        keys = [
+            self.query_cache.result_key(query, version, k, search_filter, mode)
+            for query, search_filter in zip(queries, filters)
+        ]
+        return keys, [self.query_cache.get_results(key) for key in keys]
+
+    def _store_results(
+        self,
+        keys: list[str] | None,
+        results: list[list[DocumentChunk] | None],
+        missing: list[int],
+        found: list[list[DocumentChunk]],
+    ) -> None:
+        for i, result in zip(missing, found):
+            if keys is not None:
+                self.query_cache.put_results(keys[i], result)
+            results[i] = result
+
+    def _fetch_k(self, k: int) -> int:
+        # Для переранжирования из хранилища берется больше кандидатов, чем нужно вернуть
+        return max(k, rag_settings.rerank_candidates) if self.reranker is not None else k
+
+    def _rerank(
+        self,
+        queries: list[str],
+        results: list[list[DocumentChunk]],
+        k: int,
+    ) -> list[list[DocumentChunk]]:
+        if self.reranker is None:
+            return results
+        return self.reranker.rerank_many(queries, results, k)
+
+    def search_many(
+        self,
+        queries: list[str],
+        k: int = 10,
+        filters: SearchFilter | list[SearchFilter] | None = None,
+        mode: SearchMode | None = None,
+    ) -> list[list[DocumentChunk]]:
+        mode = mode or rag_settings.search_mode
+        filters = normalize_filters(filters, len(queries))
+        fetch_k = self._fetch_k(k)
+        version = self.collection_version() if self.query_cache is not None else None
+        keys, results = self._cached_results(queries, fetch_k, filters, mode, version)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            found = self._search_many([queries[i] for i in missing], fetch_k, [filters[i] for i in missing], mode)
+            self._store_results(keys, results, missing, found)
+        return self._rerank(queries, results, k)
+
+    async def asearch(
+        self,
+        query: str,
+        k: int = 10,
+        document_id: str | None = None,
+        user_id: int | None = None,
+        mode: SearchMode | None = None,
+        document_ids: list[str] | None = None,
+    ) -> list[DocumentChunk]:
+        search_filter = self._make_filter(document_id, user_id, document_ids)
+        return (await self.asearch_many([query], k, search_filter, mode))[0]
+
+    async def asearch_many(
+        self,
+        queries: list[str],
+        k: int = 10,
+        filters: SearchFilter | list[SearchFilter] | None = None,
+        mode: SearchMode | None = None,
+    ) -> list[list[DocumentChunk]]:
+        """Поиск без блокировки event loop: encode идет в пуле потоков, число поисков ограничено."""
+        mode = mode or rag_settings.search_mode
+        filters = normalize_filters(filters, len(queries))
+        fetch_k = self._fetch_k(k)
+        async with asyncio.timeout(rag_settings.search_timeout):
+            version = await self.acollection_version() if self.query_cache is not None else None
+            keys, results = self._cached_results(queries, fetch_k, filters, mode, version)
+            missing = [i for i, result in enumerate(results) if result is None]
+            if missing:
+                async with self.search_semaphore:
+                    found = await self._asearch_many(
+                        [queries[i] for i in missing], fetch_k, [filters[i] for i in missing], mode
+                    )
+                self._store_results(keys, results, missing, found)
+            if self.reranker is not None:
+                loop = asyncio.get_running_loop()
+                results = await loop.run_in_executor(self.search_executor, self._rerank, queries, results, k)
+        return results
+
+    @abstractmethod
+    def _search_many(
+        self,
+        queries: list[str],
+        k: int,
+        filters: list[SearchFilter],
+        mode: SearchMode,
+    ) -> list[list[DocumentChunk]]:
+        """Поиск по нескольким запросам сразу, запросы кодируются одним батчем."""
+        pass
+
+    async def _asearch_many(
+        self,
+        queries: list[str],
+        k: int,
+        filters: list[SearchFilter],
+        mode: SearchMode,
+    ) -> list[list[DocumentChunk]]:
+        """Асинхронный `_search_many`. По умолчанию весь поиск выполняется в пуле потоков поиска."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.search_executor, self._search_many, queries, k, filters, mode)
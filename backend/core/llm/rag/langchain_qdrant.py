@@ -1,110 +1,423 @@
+import asyncio
+import time
 import uuid
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Hashable
 
-from langchain_community.document_loaders import (
-    PyPDFLoader,
-    Docx2txtLoader,
-    TextLoader,
-)
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from loguru import logger
 from langchain_qdrant import QdrantVectorStore
-from langchain_huggingface import HuggingFaceEmbeddings
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.http.models import (
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    HasIdCondition,
+    MatchAny,
+    MatchValue,
+    PointStruct,
+    QueryRequest,
+    QueryResponse,
+    ScoredPoint,
+    SparseVector,
+)
 
 from core.configs.rag import qdrant_settings, rag_settings
-from .base import RAGBase, DocumentChunk, DocumentExtension
+from .base import DocumentChunk, SearchFilter, SearchMode
+from .bm25 import document_sparse_vector, query_sparse_vector
+from .fusion import reciprocal_rank_fusion
+from .huggingface import HuggingFaceRAG
+from .qdrant_collection import (
+    SPARSE_VECTOR_NAME,
+    TENANT_PAYLOAD_KEY,
+    VERSION_POINT_ID,
+    build_search_params,
+    create_async_qdrant_client,
+    create_qdrant_client,
+    tenant_value,
+    version_collection_name,
+)
 
 
-class RAGLangChain(RAGBase):
+class RAGLangChain(HuggingFaceRAG):
     
     def __init__(self):
-        self.embedder = self._get_embedder()
+        super().__init__()
         self.client = self._init_qdrant_client()
+        self.async_client = self._init_async_qdrant_client()
         self.vector_store = QdrantVectorStore(
             client=self.client,
             collection_name=qdrant_settings.collection,
             embedding=self.embedder,
         )
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=rag_settings.chunk_size,
-            chunk_overlap=rag_settings.chunk_overlap,
-            length_function=len,
+        self.search_params = build_search_params()
+        self.upsert_executor = ThreadPoolExecutor(
+            max_workers=qdrant_settings.upsert_parallelism,
+            thread_name_prefix="qdrant-upsert",
         )
-    
-    def _get_embedder(self) -> HuggingFaceEmbeddings:
-        model_name = rag_settings.model_name
-        return HuggingFaceEmbeddings(model_name=model_name)
+        # Общий лимит параллельных батчей для всех асинхронных upsert, см. _aupsert_semaphore
+        self._upsert_semaphore: asyncio.Semaphore | None = None
+        # None — конфигурация коллекции еще не прочитана
+        self._sparse_enabled: bool | None = None
+        self._sparse_checked_at = float("-inf")
+        self._check_sparse()
+        self._shared_version: str | None = None
+        self._version_checked_at = float("-inf")
     
     def _init_qdrant_client(self) -> QdrantClient:
-        return QdrantClient(url=qdrant_settings.host)
+        return create_qdrant_client()
+
+    def _init_async_qdrant_client(self) -> AsyncQdrantClient:
+        return create_async_qdrant_client()
+
+    def _sparse_check_due(self) -> bool:
+        # Коллекция может появиться или получить разреженные векторы после старта API
+        # (qdrant_migration), поэтому отрицательный ответ перепроверяется
+        if self._sparse_enabled is None:
+            return True
+        if self._sparse_enabled:
+            return False
+        return time.monotonic() - self._sparse_checked_at >= rag_settings.sparse_check_interval
+
+    def _remember_sparse(self, collection) -> None:
+        sparse_vectors = collection.config.params.sparse_vectors or {}
+        enabled = SPARSE_VECTOR_NAME in sparse_vectors
+        if not enabled and self._sparse_enabled is not False:
+            logger.warning(
+                f"Collection {qdrant_settings.collection} has no '{SPARSE_VECTOR_NAME}' sparse vectors, "
+                "sparse and hybrid search fall back to dense"
+            )
+        elif enabled and self._sparse_enabled is False:
+            logger.info(f"Collection {qdrant_settings.collection} got '{SPARSE_VECTOR_NAME}' sparse vectors")
+        self._sparse_enabled = enabled
+        self._sparse_checked_at = time.monotonic()
+
+    def _forget_sparse(self, error: Exception) -> None:
+        # Ошибка чтения — не ответ: пока ищем только по плотным векторам и спросим снова при следующем вызове
+        logger.warning(f"Cannot read collection config, sparse search is disabled for now: {str(error)}")
+        self._sparse_enabled = None
+
+    def _check_sparse(self) -> bool:
+        if self._sparse_check_due():
+            try:
+                self._remember_sparse(self.client.get_collection(qdrant_settings.collection))
+            except Exception as e:
+                self._forget_sparse(e)
+        return bool(self._sparse_enabled)
+
+    async def _acheck_sparse(self) -> bool:
+        if self._sparse_check_due():
+            try:
+                self._remember_sparse(await self.async_client.get_collection(qdrant_settings.collection))
+            except Exception as e:
+                self._forget_sparse(e)
+        return bool(self._sparse_enabled)
+
+    def _version_point(self) -> PointStruct:
+        return PointStruct(id=VERSION_POINT_ID, vector={}, payload={"version": uuid.uuid4().hex})
+
+    def _version_expired(self) -> bool:
+        return time.monotonic() - self._version_checked_at >= rag_settings.collection_version_ttl
+
+    def _remember_version(self, points: list) -> None:
+        self._shared_version = points[0].payload.get("version") if points else None
+        self._version_checked_at = time.monotonic()
+
+    def _forget_version(self, error: Exception) -> None:
+        # Без общей версии не знаем, менял ли кто-то коллекцию, поэтому кэш выдач не используем
+        logger.warning(f"Cannot read shared collection version: {str(error)}")
+        self._shared_version = uuid.uuid4().hex
+        self._version_checked_at = time.monotonic()
+
+    def invalidate_search_cache(self) -> None:
+        # Версию меняем, даже если в этом процессе кэш выключен: ее читают другие процессы
+        super().invalidate_search_cache()
+        try:
+            point = self._version_point()
+            self.client.upsert(collection_name=version_collection_name(), points=[point])
+            self._remember_version([point])
+        except Exception as e:
+            logger.warning(f"Cannot bump shared collection version: {str(e)}")
+
+    async def ainvalidate_search_cache(self) -> None:
+        # Версию меняем, даже если в этом процессе кэш выключен: ее читают другие процессы
+        super().invalidate_search_cache()
+        try:
+            point = self._version_point()
+            await self.async_client.upsert(collection_name=version_collection_name(), points=[point])
+            self._remember_version([point])
+        except Exception as e:
+            logger.warning(f"Cannot bump shared collection version: {str(e)}")
+
+    def collection_version(self) -> Hashable:
+        # Общая версия ловит записи индексатора, локальная — записи этого процесса без задержки
+        if self._version_expired():
+            try:
+                self._remember_version(self.client.retrieve(
+                    collection_name=version_collection_name(),
+                    ids=[VERSION_POINT_ID],
+                    with_payload=True,
+                ))
+            except Exception as e:
+                self._forget_version(e)
+        return self._shared_version, super().collection_version()
+
+    async def acollection_version(self) -> Hashable:
+        if self._version_expired():
+            try:
+                self._remember_version(await self.async_client.retrieve(
+                    collection_name=version_collection_name(),
+                    ids=[VERSION_POINT_ID],
+                    with_payload=True,
+                ))
+            except Exception as e:
+                self._forget_version(e)
+        return self._shared_version, super().collection_version()
+
+    def _build_vector(self, chunk: DocumentChunk, sparse: bool) -> list[float] | dict:
+        if not sparse:
+            return chunk.embedding
+        indices, values = document_sparse_vector(
+            chunk.content,
+            avg_length=rag_settings.bm25_avg_length,
+            k1=rag_settings.bm25_k1,
+            b=rag_settings.bm25_b,
+        )
+        # Пустое имя — безымянный плотный вектор коллекции
+        return {"": chunk.embedding, SPARSE_VECTOR_NAME: SparseVector(indices=indices, values=values)}
     
-    def _get_loader(self, file_path: str, extension: DocumentExtension):
-        loaders = {
-            "pdf": PyPDFLoader,
-            "txt": TextLoader,
-            "doc": Docx2txtLoader,
-            "docx": Docx2txtLoader,
-            "md": TextLoader,
+    def _build_payload(self, chunk: DocumentChunk) -> dict:
+        metadata = chunk.metadata or {}
+        payload = {
+            self.vector_store.content_payload_key: chunk.content,
+            self.vector_store.metadata_payload_key: metadata,
         }
-        loader_class = loaders.get(extension, TextLoader)
-        return loader_class(file_path)
-    
-    def index_document(
-        self,
-        document_bytes: bytes,
-        extension: DocumentExtension,
-        document_id: str | None = None,
-        user_id: int | None = None,
-    ) -> bool:
-        if document_id is None:
-            document_id = str(uuid.uuid4())
-        
-        with tempfile.NamedTemporaryFile(suffix=f".{extension}", delete=True) as tmp_file:
-            tmp_file.write(document_bytes)
-            tmp_file.flush()
-            
-            loader = self._get_loader(tmp_file.name, extension)
-            documents = loader.load()
-        
-        chunks = self.text_splitter.split_documents(documents)
-        
-        for chunk in chunks:
-            if document_id is not None:
-                chunk.metadata["document_id"] = str(document_id)
-            if user_id is not None:
-                chunk.metadata["user_id"] = user_id
-        
-        self.vector_store.add_documents(chunks)
-        return True
-    
-    def search(self, query: str, k: int = 10, document_id: str | None = None) -> list[DocumentChunk]:
-        if document_id:
-            filter_dict = {
-                "must": [
-                    {
-                        "key": "document_id",
-                        "match": {
-                            "value": document_id
-                        }
-                    }
-                ]
-            }
-            docs = self.vector_store.similarity_search(
-                query, 
-                k=k,
-                filter=filter_dict
+        if metadata.get("user_id") is not None:
+            payload[TENANT_PAYLOAD_KEY] = tenant_value(metadata["user_id"])
+        return payload
+
+    def _build_points(self, chunks: list[DocumentChunk], sparse: bool) -> list[PointStruct]:
+        return [
+            PointStruct(
+                id=chunk.id,
+                vector=self._build_vector(chunk, sparse),
+                payload=self._build_payload(chunk),
             )
-        else:
-            docs = self.vector_store.similarity_search(query, k=k)
-        
-        chunks = []
-        for doc in docs:
-            chunk = DocumentChunk(
-                id=doc.metadata.get("_id", str(uuid.uuid4())),
-                document_id=doc.metadata.get("document_id", ""),
-                content=doc.page_content,
-                metadata=doc.metadata
+            for chunk in chunks
+        ]
+
+    @staticmethod
+    def _split_batches(points: list[PointStruct]) -> list[list[PointStruct]]:
+        size = max(qdrant_settings.upsert_batch_size, 1)
+        return [points[i:i + size] for i in range(0, len(points), size)]
+
+    def _upsert_batch(self, points: list[PointStruct]) -> None:
+        self.client.upsert(
+            collection_name=qdrant_settings.collection,
+            points=points,
+            wait=qdrant_settings.upsert_wait,
+        )
+
+    def upsert_chunks(self, chunks: list[DocumentChunk]) -> None:
+        if not chunks:
+            return
+        batches = self._split_batches(self._build_points(chunks, self._check_sparse()))
+        # list() дожидается всех батчей и пробрасывает первую ошибку
+        list(self.upsert_executor.map(self._upsert_batch, batches))
+        self.invalidate_search_cache()
+
+    def _aupsert_semaphore(self) -> asyncio.Semaphore:
+        # Один семафор на экземпляр: конвейер вызывает aupsert_chunks из нескольких воркеров,
+        # и семафор на вызов умножил бы QDRANT_UPSERT_PARALLELISM на их число.
+        # Создается при первом вызове, уже внутри работающего event loop.
+        if self._upsert_semaphore is None:
+            self._upsert_semaphore = asyncio.Semaphore(qdrant_settings.upsert_parallelism)
+        return self._upsert_semaphore
+
+    async def aupsert_chunks(self, chunks: list[DocumentChunk]) -> None:
+        if not chunks:
+            return
+        semaphore = self._aupsert_semaphore()
+
+        async def upsert_batch(points: list[PointStruct]) -> None:
+            async with semaphore:
+                await self.async_client.upsert(
+                    collection_name=qdrant_settings.collection,
+                    points=points,
+                    wait=qdrant_settings.upsert_wait,
+                )
+
+        points = self._build_points(chunks, await self._acheck_sparse())
+        await asyncio.gather(*(upsert_batch(batch) for batch in self._split_batches(points)))
+        await self.ainvalidate_search_cache()
+
+    def _document_filter(self, document_id: str, keep_ids: set[str] | None = None) -> Filter:
+        return Filter(
+            must=[
+                FieldCondition(
+                    key=f"{self.vector_store.metadata_payload_key}.document_id",
+                    match=MatchValue(value=str(document_id)),
+                )
+            ],
+            must_not=[HasIdCondition(has_id=list(keep_ids))] if keep_ids else None,
+        )
+
+    def get_chunk_ids(self, document_id: str) -> set[str]:
+        chunk_ids = set()
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=qdrant_settings.collection,
+                scroll_filter=self._document_filter(document_id),
+                limit=1000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
             )
-            chunks.append(chunk)
-        
+            chunk_ids.update(str(point.id) for point in points)
+            if offset is None:
+                return chunk_ids
+
+    async def aget_chunk_ids(self, document_id: str) -> set[str]:
+        chunk_ids = set()
+        offset = None
+        while True:
+            points, offset = await self.async_client.scroll(
+                collection_name=qdrant_settings.collection,
+                scroll_filter=self._document_filter(document_id),
+                limit=1000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            chunk_ids.update(str(point.id) for point in points)
+            if offset is None:
+                return chunk_ids
+
+    def delete_document(self, document_id: str, keep_ids: set[str] | None = None) -> None:
+        self.client.delete(
+            collection_name=qdrant_settings.collection,
+            points_selector=FilterSelector(filter=self._document_filter(document_id, keep_ids)),
+        )
+        self.invalidate_search_cache()
+
+    async def adelete_document(self, document_id: str, keep_ids: set[str] | None = None) -> None:
+        await self.async_client.delete(
+            collection_name=qdrant_settings.collection,
+            points_selector=FilterSelector(filter=self._document_filter(document_id, keep_ids)),
+        )
+        await self.ainvalidate_search_cache()
+
+    def _search_filter(self, search_filter: SearchFilter) -> Filter | None:
+        conditions = []
+        documents = search_filter.documents
+        if documents is not None:
+            conditions.append(FieldCondition(
+                key=f"{self.vector_store.metadata_payload_key}.document_id",
+                match=MatchValue(value=documents[0]) if len(documents) == 1 else MatchAny(any=list(documents)),
+            ))
+        if search_filter.user_id is not None:
+            # Фильтр по tenant полю Qdrant обслуживает из сегментов пользователя, не сканируя чужие
+            conditions.append(FieldCondition(
+                key=TENANT_PAYLOAD_KEY,
+                match=MatchValue(value=tenant_value(search_filter.user_id)),
+            ))
+        return Filter(must=conditions) if conditions else None
+
+    def _points_to_chunks(self, points: list[ScoredPoint]) -> list[DocumentChunk]:
+        chunks = []
+        for point in points:
+            payload = point.payload or {}
+            metadata = dict(payload.get(self.vector_store.metadata_payload_key) or {})
+            metadata["_id"] = str(point.id)
+            metadata["_collection_name"] = qdrant_settings.collection
+            chunks.append(DocumentChunk(
+                id=str(point.id),
+                document_id=metadata.get("document_id", ""),
+                content=payload.get(self.vector_store.content_payload_key, ""),
+                metadata=metadata,
+            ))
         return chunks
+
+    def _dense_request(self, vector: list[float], query_filter: Filter | None, limit: int) -> QueryRequest:
+        return QueryRequest(
+            query=vector,
+            filter=query_filter,
+            params=self.search_params,
+            limit=limit,
+            with_payload=True,
+        )
+
+    def _sparse_request(self, query: str, query_filter: Filter | None, limit: int) -> QueryRequest:
+        indices, values = query_sparse_vector(query)
+        return QueryRequest(
+            query=SparseVector(indices=indices, values=values),
+            using=SPARSE_VECTOR_NAME,
+            filter=query_filter,
+            limit=limit,
+            with_payload=True,
+        )
+
+    @staticmethod
+    def _search_mode(mode: SearchMode, sparse: bool) -> SearchMode:
+        return mode if sparse else "dense"
+
+    def _build_requests(
+        self,
+        queries: list[str],
+        vectors: list[list[float] | None],
+        filters: list[SearchFilter],
+        k: int,
+        mode: SearchMode,
+    ) -> list[QueryRequest]:
+        # Все выдачи всех запросов уходят в Qdrant одним batch-запросом
+        limit = max(k, rag_settings.hybrid_prefetch_limit) if mode == "hybrid" else k
+        requests = []
+        for query, vector, search_filter in zip(queries, vectors, filters):
+            query_filter = self._search_filter(search_filter)
+            if mode != "sparse":
+                requests.append(self._dense_request(vector, query_filter, limit))
+            if mode != "dense":
+                requests.append(self._sparse_request(query, query_filter, limit))
+        return requests
+
+    def _search_many(
+        self,
+        queries: list[str],
+        k: int,
+        filters: list[SearchFilter],
+        mode: SearchMode,
+    ) -> list[list[DocumentChunk]]:
+        mode = self._search_mode(mode, self._check_sparse())
+        vectors = self.embed_queries(queries) if mode != "sparse" else [None] * len(queries)
+        responses = self.client.query_batch_points(
+            collection_name=qdrant_settings.collection,
+            requests=self._build_requests(queries, vectors, filters, k, mode),
+        )
+        return self._merge_responses(responses, k, mode)
+
+    async def _asearch_many(
+        self,
+        queries: list[str],
+        k: int,
+        filters: list[SearchFilter],
+        mode: SearchMode,
+    ) -> list[list[DocumentChunk]]:
+        mode = self._search_mode(mode, await self._acheck_sparse())
+        vectors = await self.aembed_queries(queries) if mode != "sparse" else [None] * len(queries)
+        responses = await self.async_client.query_batch_points(
+            collection_name=qdrant_settings.collection,
+            requests=self._build_requests(queries, vectors, filters, k, mode),
+        )
+        return self._merge_responses(responses, k, mode)
+
+    def _merge_responses(self, responses: list[QueryResponse], k: int, mode: SearchMode) -> list[list[DocumentChunk]]:
+        if mode != "hybrid":
+            return [self._points_to_chunks(response.points) for response in responses]
+        return [
+            reciprocal_rank_fusion(
+                [self._points_to_chunks(dense.points), self._points_to_chunks(sparse.points)],
+                limit=k,
+                rrf_k=rag_settings.rrf_k,
+            )
+            for dense, sparse in zip(responses[0::2], responses[1::2])
+        ]
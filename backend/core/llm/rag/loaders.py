@@ -0,0 +1,73 @@
+import io
+from typing import BinaryIO, Iterator
+
+from pypdf import PdfReader
+
+from .base import DocumentExtension, DocumentPage, DocumentSource
+
+# Сколько символов текстового файла читать за раз
+TEXT_BLOCK_SIZE = 64 * 1024
+
+
+def as_stream(source: DocumentSource) -> BinaryIO:
+    """Обернуть байты в поток. Файлы и mmap-буферы читаются напрямую, без копирования на диск."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+
+def count_pdf_pages(stream: BinaryIO) -> int:
+    return len(PdfReader(stream).pages)
+
+
+def iter_pdf_pages(stream: BinaryIO, start: int = 0, stop: int | None = None) -> Iterator[DocumentPage]:
+    reader = PdfReader(stream)
+    total_pages = len(reader.pages)
+    page_labels = reader.page_labels
+    for page_number in range(start, min(stop if stop is not None else total_pages, total_pages)):
+        page = reader.pages[page_number]
+        yield DocumentPage(
+            content=page.extract_text() or "",
+            metadata={
+                "page": page_number,
+                "page_label": page_labels[page_number] if page_labels else str(page_number + 1),
+                "total_pages": total_pages,
+            },
+        )
+
+
+def iter_docx_pages(stream: BinaryIO) -> Iterator[DocumentPage]:
+    import docx2txt
+
+    yield DocumentPage(content=docx2txt.process(stream), metadata={})
+
+
+def iter_text_pages(stream: BinaryIO) -> Iterator[DocumentPage]:
+    """Отдавать текст блоками по границам строк, не читая файл целиком."""
+    reader = io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+    block: list[str] = []
+    block_size = 0
+    try:
+        for line in reader:
+            block.append(line)
+            block_size += len(line)
+            if block_size >= TEXT_BLOCK_SIZE:
+                yield DocumentPage(content="".join(block), metadata={})
+                block, block_size = [], 0
+        if block:
+            yield DocumentPage(content="".join(block), metadata={})
+    finally:
+        # Не закрываем исходный поток вместе с оберткой
+        reader.detach()
+
+
+def iter_pages(source: DocumentSource, extension: DocumentExtension) -> Iterator[DocumentPage]:
+    """Лениво отдавать страницы документа по одной."""
+    stream = as_stream(source)
+    if extension == "pdf":
+        yield from iter_pdf_pages(stream)
+    elif extension in ("doc", "docx"):
+        yield from iter_docx_pages(stream)
+    else:
+        yield from iter_text_pages(stream)
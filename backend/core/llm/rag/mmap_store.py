@@ -0,0 +1,456 @@
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable
+
+import numpy as np
+
+
+# Сколько строк матрицы умножать за раз, чтобы не копировать всю матрицу из mmap
+SCORE_BLOCK_ROWS = 65536
+INITIAL_CAPACITY = 1024
+
+
+@dataclass(slots=True)
+class StoredPoint:
+    id: str
+    document_id: str
+    user_id: int | None
+    content: str
+    metadata: dict
+    score: float = 0.0
+
+
+class IVFIndex:
+    """Инвертированный индекс по центроидам k-means для приближенного поиска.
+
+    Каждой строке матрицы назначается ближайший центроид, при поиске
+    просматриваются только строки из `probes` ближайших к запросу центроидов.
+    """
+
+    def __init__(self, lists: int, probes: int, centroids: np.ndarray | None = None, capacity: int = 0):
+        self.lists = lists
+        self.probes = probes
+        self.centroids = centroids
+        self.assignment: np.ndarray = np.full(capacity, -1, dtype=np.int32)
+        self.built_for = 0
+
+    def build(self, vectors: np.ndarray, rows: np.ndarray, capacity: int, iterations: int = 10) -> None:
+        lists = self.lists or max(int(np.sqrt(len(rows))), 1)
+        rng = np.random.default_rng(42)
+        sample = rows[rng.choice(len(rows), size=min(len(rows), lists * 64), replace=False)]
+        points = np.asarray(vectors[np.sort(sample)], dtype=np.float32)
+        centroids = points[rng.choice(len(points), size=min(lists, len(points)), replace=False)]
+
+        # Сферический k-means: векторы нормированы, близость — скалярное произведение
+        for _ in range(iterations):
+            labels = np.argmax(points @ centroids.T, axis=1)
+            for label in range(len(centroids)):
+                members = points[labels == label]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[label] = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+        self.centroids = centroids
+        self.assignment = np.full(capacity, -1, dtype=np.int32)
+        self.add(vectors, rows)
+        self.built_for = len(rows)
+
+    def add(self, vectors: np.ndarray, rows: np.ndarray) -> None:
+        if self.centroids is None or not len(rows):
+            return
+        for start in range(0, len(rows), SCORE_BLOCK_ROWS):
+            block = rows[start:start + SCORE_BLOCK_ROWS]
+            scores = np.asarray(vectors[block], dtype=np.float32) @ self.centroids.T
+            self.assignment[block] = np.argmax(scores, axis=1)
+
+    def resize(self, capacity: int) -> None:
+        if self.centroids is None:
+            return
+        assignment = np.full(capacity, -1, dtype=np.int32)
+        assignment[:len(self.assignment)] = self.assignment
+        self.assignment = assignment
+
+    def candidates(self, query: np.ndarray, size: int) -> np.ndarray:
+        probes = np.argsort(-(self.centroids @ query))[:self.probes]
+        return np.isin(self.assignment[:size], probes)
+
+
+class MmapVectorStore:
+    """Встроенное хранилище векторов в файлах процесса.
+
+    Векторы нормируются и лежат в memory-mapped матрице `vectors.npy`, поля чанков —
+    в SQLite рядом с ней. Для фильтрации в памяти держатся массивы document_id и
+    user_id по строкам матрицы, поэтому фильтр и скалярные произведения считаются
+    векторно в NumPy. Удаленные строки переиспользуются при следующих записях.
+
+    Для лексического поиска термы чанков, полученные `analyzer`, лежат в FTS5
+    таблице и ранжируются встроенным в SQLite BM25.
+
+    Писать в хранилище должен один процесс. Остальные процессы перечитывают его,
+    когда видят в SQLite новый номер поколения.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dimension: int,
+        dtype: str = "float32",
+        ivf_enabled: bool = False,
+        ivf_min_points: int = 50_000,
+        ivf_lists: int = 0,
+        ivf_probes: int = 8,
+        analyzer: Callable[[str], list[str]] | None = None,
+    ):
+        self.path = Path(path)
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        self.ivf_enabled = ivf_enabled
+        self.ivf_min_points = ivf_min_points
+        self.ivf_lists = ivf_lists
+        self.ivf_probes = ivf_probes
+        self.analyzer = analyzer
+        self._lock = threading.RLock()
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.path / "vectors.npy"
+        self._centroids_path = self.path / "centroids.npy"
+        self._connection = sqlite3.connect(self.path / "payload.sqlite3", check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS points ("
+            "row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, document_id TEXT NOT NULL, "
+            "user_id INTEGER, content TEXT NOT NULL, metadata TEXT NOT NULL, ivf_list INTEGER)"
+        )
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        # rowid совпадает со строкой матрицы
+        self._connection.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS points_fts USING fts5(terms, tokenize='ascii')"
+        )
+        self._connection.commit()
+        self._backfill_terms()
+        self._load()
+
+    def _terms(self, content: str) -> str:
+        return " ".join(self.analyzer(content))
+
+    def _backfill_terms(self) -> None:
+        """Досчитать термы для чанков, записанных без них."""
+        if self.analyzer is None:
+            return
+        missing = self._connection.execute(
+            "SELECT row, content FROM points WHERE row NOT IN (SELECT rowid FROM points_fts)"
+        ).fetchall()
+        if missing:
+            self._connection.executemany(
+                "INSERT INTO points_fts (rowid, terms) VALUES (?, ?)",
+                [(row, self._terms(content)) for row, content in missing],
+            )
+            self._connection.commit()
+
+    def _get_meta(self, key: str, default: int = 0) -> int:
+        row = self._connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key: str, value: int) -> None:
+        self._connection.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def _load(self) -> None:
+        if self._vectors_path.exists():
+            self._vectors = np.load(self._vectors_path, mmap_mode="r+")
+        else:
+            self._vectors = np.lib.format.open_memmap(
+                self._vectors_path, mode="w+", dtype=self.dtype, shape=(INITIAL_CAPACITY, self.dimension)
+            )
+        self.dtype = self._vectors.dtype
+        capacity = len(self._vectors)
+
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._document_codes = np.full(capacity, -1, dtype=np.int64)
+        self._user_ids = np.full(capacity, -1, dtype=np.int64)
+        self._ids: list[str | None] = [None] * capacity
+        self._row_by_id: dict[str, int] = {}
+        self._code_by_document: dict[str, int] = {}
+        self._size = 0
+        self._ivf: IVFIndex | None = None
+        # IVF строит только пишущий процесс, читатели берут готовые центроиды и списки
+        if self.ivf_enabled and self._centroids_path.exists():
+            self._ivf = IVFIndex(
+                self.ivf_lists, self.ivf_probes, centroids=np.load(self._centroids_path), capacity=capacity
+            )
+            self._ivf.built_for = self._get_meta("ivf_built_for")
+
+        for row, point_id, document_id, user_id, ivf_list in self._connection.execute(
+            "SELECT row, id, document_id, user_id, ivf_list FROM points"
+        ):
+            self._set_row(row, point_id, document_id, user_id)
+            if self._ivf is not None and ivf_list is not None:
+                self._ivf.assignment[row] = ivf_list
+            self._size = max(self._size, row + 1)
+        self._free_rows = [int(row) for row in np.flatnonzero(~self._alive[:self._size])]
+        self._generation = self._get_meta("generation")
+
+    @property
+    def generation(self) -> int:
+        with self._lock:
+            return self._get_meta("generation")
+
+    def _refresh(self) -> None:
+        """Перечитать хранилище, если его изменил другой процесс."""
+        if self._get_meta("generation") != self._generation:
+            self._load()
+
+    def _document_code(self, document_id: str) -> int:
+        code = self._code_by_document.get(document_id)
+        if code is None:
+            code = len(self._code_by_document)
+            self._code_by_document[document_id] = code
+        return code
+
+    def _set_row(self, row: int, point_id: str, document_id: str, user_id: int | None) -> None:
+        self._alive[row] = True
+        self._document_codes[row] = self._document_code(document_id)
+        self._user_ids[row] = -1 if user_id is None else user_id
+        self._ids[row] = point_id
+        self._row_by_id[point_id] = row
+
+    def _grow(self, required: int) -> None:
+        capacity = len(self._vectors)
+        if required <= capacity:
+            return
+        new_capacity = max(capacity * 2, required)
+        tmp_path = self.path / "vectors.tmp.npy"
+        vectors = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=self.dtype, shape=(new_capacity, self.dimension)
+        )
+        vectors[:capacity] = self._vectors
+        vectors.flush()
+        del vectors
+        os.replace(tmp_path, self._vectors_path)
+        self._vectors = np.load(self._vectors_path, mmap_mode="r+")
+
+        extra = new_capacity - capacity
+        self._alive = np.concatenate([self._alive, np.zeros(extra, dtype=bool)])
+        self._document_codes = np.concatenate([self._document_codes, np.full(extra, -1, dtype=np.int64)])
+        self._user_ids = np.concatenate([self._user_ids, np.full(extra, -1, dtype=np.int64)])
+        self._ids.extend([None] * extra)
+        if self._ivf is not None:
+            self._ivf.resize(new_capacity)
+
+    def _commit(self) -> None:
+        self._vectors.flush()
+        self._generation += 1
+        self._set_meta("generation", self._generation)
+        self._connection.commit()
+
+    def upsert(self, points: list[StoredPoint], vectors: np.ndarray) -> None:
+        if not points:
+            return
+        # Повторы одного id в пачке схлопываем, побеждает последний
+        latest = list({point.id: i for i, point in enumerate(points)}.values())
+        points = [points[i] for i in latest]
+        vectors = np.asarray(vectors, dtype=np.float32)[latest]
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        with self._lock:
+            self._refresh()
+            rows = []
+            for point in points:
+                row = self._row_by_id.get(point.id)
+                if row is None:
+                    row = self._free_rows.pop() if self._free_rows else self._size
+                    self._size = max(self._size, row + 1)
+                rows.append(row)
+            self._grow(self._size)
+
+            rows = np.asarray(rows)
+            self._vectors[rows] = vectors.astype(self.dtype)
+            for row, point in zip(rows, points):
+                self._set_row(int(row), point.id, point.document_id, point.user_id)
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO points (row, id, document_id, user_id, content, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (int(row), point.id, point.document_id, point.user_id, point.content, json.dumps(point.metadata))
+                    for row, point in zip(rows, points)
+                ],
+            )
+            self._connection.executemany(
+                "DELETE FROM points_fts WHERE rowid = ?", [(int(row),) for row in rows]
+            )
+            if self.analyzer is not None:
+                self._connection.executemany(
+                    "INSERT INTO points_fts (rowid, terms) VALUES (?, ?)",
+                    [(int(row), self._terms(point.content)) for row, point in zip(rows, points)],
+                )
+            if self._ivf is not None:
+                self._ivf.add(self._vectors, rows)
+                self._save_ivf_lists(rows)
+            self._ensure_ivf()
+            self._commit()
+
+    def _document_mask(self, document_id: str) -> np.ndarray:
+        code = self._code_by_document.get(document_id)
+        if code is None:
+            return np.zeros(self._size, dtype=bool)
+        return self._alive[:self._size] & (self._document_codes[:self._size] == code)
+
+    def _filter_mask(self, document_ids: Iterable[str] | None, user_id: int | None) -> np.ndarray:
+        mask = self._alive[:self._size].copy()
+        if document_ids is not None:
+            codes = [self._code_by_document[d] for d in document_ids if d in self._code_by_document]
+            mask &= np.isin(self._document_codes[:self._size], codes)
+        if user_id is not None:
+            mask &= self._user_ids[:self._size] == user_id
+        return mask
+
+    def get_ids(self, document_id: str) -> set[str]:
+        with self._lock:
+            self._refresh()
+            return {self._ids[row] for row in np.flatnonzero(self._document_mask(document_id))}
+
+    def delete_document(self, document_id: str, keep_ids: set[str] | None = None) -> None:
+        with self._lock:
+            self._refresh()
+            rows = [
+                int(row) for row in np.flatnonzero(self._document_mask(document_id))
+                if not keep_ids or self._ids[row] not in keep_ids
+            ]
+            if not rows:
+                return
+            for row in rows:
+                self._alive[row] = False
+                self._row_by_id.pop(self._ids[row], None)
+                self._ids[row] = None
+            self._free_rows.extend(rows)
+            self._connection.executemany("DELETE FROM points WHERE row = ?", [(row,) for row in rows])
+            self._connection.executemany("DELETE FROM points_fts WHERE rowid = ?", [(row,) for row in rows])
+            self._commit()
+
+    def _ensure_ivf(self) -> None:
+        if not self.ivf_enabled:
+            return
+        alive_count = int(self._alive[:self._size].sum())
+        if alive_count < self.ivf_min_points:
+            return
+        # Перестраиваем центроиды, когда коллекция выросла вдвое с прошлой сборки
+        if self._ivf is None or alive_count >= 2 * self._ivf.built_for:
+            rows = np.flatnonzero(self._alive[:self._size])
+            ivf = IVFIndex(self.ivf_lists, self.ivf_probes)
+            ivf.build(self._vectors, rows, len(self._vectors))
+            self._ivf = ivf
+            tmp_path = self.path / "centroids.tmp.npy"
+            np.save(tmp_path, ivf.centroids)
+            os.replace(tmp_path, self._centroids_path)
+            self._set_meta("ivf_built_for", ivf.built_for)
+            self._save_ivf_lists(rows)
+
+    def _save_ivf_lists(self, rows: np.ndarray) -> None:
+        self._connection.executemany(
+            "UPDATE points SET ivf_list = ? WHERE row = ?",
+            [(int(self._ivf.assignment[row]), int(row)) for row in rows],
+        )
+
+    def _top_k(self, rows: np.ndarray, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        scores = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), SCORE_BLOCK_ROWS):
+            block = rows[start:start + SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = np.asarray(self._vectors[block], dtype=np.float32) @ query
+        if len(rows) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(-scores[top])]
+        return rows[top], scores[top]
+
+    def search(
+        self,
+        vector: list[float],
+        k: int,
+        document_ids: Iterable[str] | None = None,
+        user_id: int | None = None,
+    ) -> list[StoredPoint]:
+        query = np.asarray(vector, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+
+        with self._lock:
+            self._refresh()
+            mask = self._filter_mask(document_ids, user_id)
+
+            if self._ivf is not None:
+                candidates = mask & self._ivf.candidates(query, self._size)
+                # Если в просмотренных кластерах мало подходящих строк, считаем точно
+                if candidates.sum() >= k:
+                    mask = candidates
+
+            rows, scores = self._top_k(np.flatnonzero(mask), query, k)
+            return self._fetch_points([int(row) for row in rows], [float(score) for score in scores])
+
+    def search_terms(
+        self,
+        terms: list[str],
+        k: int,
+        document_ids: Iterable[str] | None = None,
+        user_id: int | None = None,
+    ) -> list[StoredPoint]:
+        """Лексический поиск по термам с ранжированием BM25."""
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+        conditions, params = ["points_fts MATCH ?"], [match]
+        if document_ids is not None:
+            document_ids = list(document_ids)
+            if not document_ids:
+                return []
+            conditions.append(f"points.document_id IN ({','.join('?' * len(document_ids))})")
+            params.extend(document_ids)
+        if user_id is not None:
+            conditions.append("points.user_id = ?")
+            params.append(user_id)
+
+        with self._lock:
+            self._refresh()
+            # bm25() в SQLite отрицательный: чем меньше, тем релевантнее
+            found = self._connection.execute(
+                "SELECT points_fts.rowid, -bm25(points_fts) FROM points_fts "
+                "JOIN points ON points.row = points_fts.rowid "
+                f"WHERE {' AND '.join(conditions)} ORDER BY bm25(points_fts) LIMIT ?",
+                [*params, k],
+            ).fetchall()
+            return self._fetch_points([row for row, _ in found], [score for _, score in found])
+
+    def _fetch_points(self, rows: list[int], scores: list[float]) -> list[StoredPoint]:
+        if not rows:
+            return []
+        placeholders = ",".join("?" * len(rows))
+        records = {
+            record[0]: record[1:]
+            for record in self._connection.execute(
+                f"SELECT row, id, document_id, user_id, content, metadata FROM points WHERE row IN ({placeholders})",
+                rows,
+            )
+        }
+        points = []
+        for row, score in zip(rows, scores):
+            point_id, document_id, user_id, content, metadata = records[row]
+            points.append(StoredPoint(
+                id=point_id,
+                document_id=document_id,
+                user_id=user_id,
+                content=content,
+                metadata=json.loads(metadata),
+                score=score,
+            ))
+        return points
+
+    def close(self) -> None:
+        with self._lock:
+            self._vectors.flush()
+            self._connection.close()
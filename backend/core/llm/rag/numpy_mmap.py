@@ -0,0 +1,90 @@
+import numpy as np
+
+from core.configs.rag import rag_settings
+from .base import DocumentChunk, SearchFilter, SearchMode
+from .bm25 import hashed_terms
+from .fusion import reciprocal_rank_fusion
+from .huggingface import HuggingFaceRAG
+from .mmap_store import MmapVectorStore, StoredPoint
+
+
+class RAGNumpy(HuggingFaceRAG):
+    """RAG движок без сервера: векторы хранятся в memory-mapped файлах процесса.
+
+    Подходит для небольших установок на одной машине и для бенчмарков,
+    поиск идет без сетевого запроса к Qdrant.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.store = MmapVectorStore(
+            path=rag_settings.numpy_store_path,
+            dimension=rag_settings.embedding_size,
+            dtype=rag_settings.numpy_store_dtype,
+            ivf_enabled=rag_settings.numpy_ivf_enabled,
+            ivf_min_points=rag_settings.numpy_ivf_min_points,
+            ivf_lists=rag_settings.numpy_ivf_lists,
+            ivf_probes=rag_settings.numpy_ivf_probes,
+            analyzer=hashed_terms,
+        )
+
+    def upsert_chunks(self, chunks: list[DocumentChunk]) -> None:
+        if not chunks:
+            return
+        points = [
+            StoredPoint(
+                id=chunk.id,
+                document_id=str(chunk.document_id),
+                user_id=(chunk.metadata or {}).get("user_id"),
+                content=chunk.content,
+                metadata=chunk.metadata or {},
+            )
+            for chunk in chunks
+        ]
+        self.store.upsert(points, np.asarray([chunk.embedding for chunk in chunks], dtype=np.float32))
+
+    def get_chunk_ids(self, document_id: str) -> set[str]:
+        return self.store.get_ids(str(document_id))
+
+    def delete_document(self, document_id: str, keep_ids: set[str] | None = None) -> None:
+        self.store.delete_document(str(document_id), keep_ids)
+
+    def collection_version(self) -> int:
+        # Поколение хранилища меняется и при записи из другого процесса
+        return self.store.generation
+
+    def _search_many(
+        self,
+        queries: list[str],
+        k: int,
+        filters: list[SearchFilter],
+        mode: SearchMode,
+    ) -> list[list[DocumentChunk]]:
+        vectors = self.embed_queries(queries) if mode != "sparse" else [None] * len(queries)
+        limit = max(k, rag_settings.hybrid_prefetch_limit) if mode == "hybrid" else k
+        results = []
+        for query, vector, search_filter in zip(queries, vectors, filters):
+            document_ids, user_id = search_filter.documents, search_filter.user_id
+            rankings = []
+            if mode != "sparse":
+                rankings.append(self._to_chunks(self.store.search(vector, limit, document_ids, user_id)))
+            if mode != "dense":
+                rankings.append(self._to_chunks(
+                    self.store.search_terms(hashed_terms(query), limit, document_ids, user_id)
+                ))
+            if mode == "hybrid":
+                results.append(reciprocal_rank_fusion(rankings, limit=k, rrf_k=rag_settings.rrf_k))
+            else:
+                results.append(rankings[0])
+        return results
+
+    def _to_chunks(self, points: list[StoredPoint]) -> list[DocumentChunk]:
+        return [
+            DocumentChunk(
+                id=point.id,
+                document_id=point.document_id,
+                content=point.content,
+                metadata={**point.metadata, "_id": point.id},
+            )
+            for point in points
+        ]
@@ -0,0 +1,112 @@
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.http.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Disabled,
+    Distance,
+    Modifier,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    SparseVectorParams,
+    VectorParams,
+    VectorParamsDiff,
+)
+
+from core.configs.rag import qdrant_settings, rag_settings
+
+
+# Имя разреженного BM25 вектора рядом с безымянным плотным
+SPARSE_VECTOR_NAME = "bm25"
+
+# Владелец чанка строкой в корне payload: is_tenant поддерживается только для keyword индексов,
+# а user_id в metadata — число
+TENANT_PAYLOAD_KEY = "tenant_id"
+
+
+def tenant_value(user_id: int) -> str:
+    return str(user_id)
+
+
+# Версия коллекции лежит в отдельной коллекции без векторов, чтобы ее видели
+# и индексатор, и API: после записи индексатор меняет ее, и кэши выдач в API устаревают
+VERSION_POINT_ID = 0
+
+
+def version_collection_name() -> str:
+    return f"{qdrant_settings.collection}_version"
+
+
+def create_qdrant_client() -> QdrantClient:
+    return QdrantClient(
+        url=qdrant_settings.host,
+        grpc_port=qdrant_settings.grpc_port,
+        prefer_grpc=qdrant_settings.prefer_grpc,
+        timeout=qdrant_settings.timeout,
+    )
+
+
+def create_async_qdrant_client() -> AsyncQdrantClient:
+    return AsyncQdrantClient(
+        url=qdrant_settings.host,
+        grpc_port=qdrant_settings.grpc_port,
+        prefer_grpc=qdrant_settings.prefer_grpc,
+        timeout=qdrant_settings.timeout,
+    )
+
+
+def build_vectors_config() -> VectorParams:
+    return VectorParams(
+        size=rag_settings.embedding_size,
+        distance=Distance.COSINE,
+        on_disk=rag_settings.vectors_on_disk,
+    )
+
+
+def build_vectors_config_diff() -> dict[str, VectorParamsDiff]:
+    # Пустое имя — единственный безымянный вектор коллекции
+    return {"": VectorParamsDiff(on_disk=rag_settings.vectors_on_disk)}
+
+
+def build_sparse_vectors_config() -> dict[str, SparseVectorParams]:
+    # Документы хранят только TF-часть BM25, IDF по коллекции считает Qdrant
+    return {SPARSE_VECTOR_NAME: SparseVectorParams(modifier=Modifier.IDF)}
+
+
+def build_quantization_config(mode: str | None = None) -> ScalarQuantization | BinaryQuantization | None:
+    """Квантизованная копия векторов держится в RAM, оригиналы могут лежать на диске.
+
+    `mode` по умолчанию берется из настроек, явно его передает бенчмарк квантизации.
+    """
+    mode = mode or rag_settings.quantization
+    if mode == "scalar":
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8,
+                quantile=rag_settings.quantization_quantile,
+                always_ram=rag_settings.quantization_always_ram,
+            )
+        )
+    if mode == "binary":
+        return BinaryQuantization(
+            binary=BinaryQuantizationConfig(always_ram=rag_settings.quantization_always_ram)
+        )
+    return None
+
+
+def build_quantization_config_diff() -> ScalarQuantization | BinaryQuantization | Disabled:
+    return build_quantization_config() or Disabled.DISABLED
+
+
+def build_search_params() -> SearchParams | None:
+    """Кандидаты ищутся по квантизованным векторам с запасом, затем пересчитываются по оригиналам."""
+    if rag_settings.quantization == "none":
+        return None
+    return SearchParams(
+        quantization=QuantizationSearchParams(
+            rescore=rag_settings.search_rescore,
+            oversampling=rag_settings.search_oversampling,
+        )
+    )
@@ -0,0 +1,105 @@
+import threading
+import time
+from typing import Callable, Hashable
+
+from cachetools import TTLCache
+
+from core.configs.deployment import deployment_settings
+from core.monitoring.rag import (
+    RAG_QUERY_CACHE_HITS,
+    RAG_QUERY_CACHE_MISSES,
+    RAG_QUERY_ENCODE_SAVED_SECONDS,
+)
+from .base import DocumentChunk
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class QueryCache:
+    """Кэши поиска в памяти процесса: эмбеддинги запросов и готовые выдачи.
+
+    Оба кэша ограничены по размеру (LRU) и по времени жизни записей. Ключ выдачи
+    содержит версию коллекции: после записи или удаления чанков версия растет,
+    и старые выдачи больше не находятся, пока не вытеснятся сами.
+    """
+
+    def __init__(self, embedding_size: int, embedding_ttl: int, result_size: int, result_ttl: int):
+        self._embeddings: TTLCache = TTLCache(maxsize=embedding_size, ttl=embedding_ttl)
+        self._results: TTLCache = TTLCache(maxsize=result_size, ttl=result_ttl)
+        # cachetools не потокобезопасен, а поиск идет из нескольких потоков
+        self._lock = threading.Lock()
+        self._encode_seconds = 0.0
+        self._encodes = 0
+        self.version = 0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.version += 1
+
+    def _record(self, cache: str, hit: bool) -> None:
+        counter = RAG_QUERY_CACHE_HITS if hit else RAG_QUERY_CACHE_MISSES
+        counter.labels(service=deployment_settings.service_name, cache=cache).inc()
+
+    def embed_query(self, query: str, encode: Callable[[str], list[float]]) -> list[float]:
+        key = normalize_query(query)
+        with self._lock:
+            embedding = self._embeddings.get(key)
+            average_encode = self._encode_seconds / self._encodes if self._encodes else 0.0
+        self._record("embedding", embedding is not None)
+        if embedding is not None:
+            RAG_QUERY_ENCODE_SAVED_SECONDS.labels(service=deployment_settings.service_name).inc(average_encode)
+            return embedding
+
+        start_time = time.perf_counter()
+        embedding = encode(query)
+        duration = time.perf_counter() - start_time
+        with self._lock:
+            self._embeddings[key] = embedding
+            self._encode_seconds += duration
+            self._encodes += 1
+        return embedding
+
+    def embed_queries(
+        self,
+        queries: list[str],
+        encode_many: Callable[[list[str]], list[list[float]]],
+    ) -> list[list[float]]:
+        """Вернуть эмбеддинги запросов, посчитав все промахи одним батчем."""
+        keys = [normalize_query(query) for query in queries]
+        with self._lock:
+            embeddings = [self._embeddings.get(key) for key in keys]
+            average_encode = self._encode_seconds / self._encodes if self._encodes else 0.0
+
+        missing: dict[str, str] = {}
+        for query, key, embedding in zip(queries, keys, embeddings):
+            self._record("embedding", embedding is not None)
+            if embedding is not None:
+                RAG_QUERY_ENCODE_SAVED_SECONDS.labels(service=deployment_settings.service_name).inc(average_encode)
+            else:
+                missing.setdefault(key, query)
+        if not missing:
+            return embeddings
+
+        start_time = time.perf_counter()
+        computed = dict(zip(missing, encode_many(list(missing.values()))))
+        duration = time.perf_counter() - start_time
+        with self._lock:
+            self._embeddings.update(computed)
+            self._encode_seconds += duration
+            self._encodes += len(computed)
+        return [embedding if embedding is not None else computed[key] for key, embedding in zip(keys, embeddings)]
+
+    def result_key(self, query: str, version: Hashable, *params: Hashable) -> tuple:
+        return (normalize_query(query), version, *params)
+
+    def get_results(self, key: tuple) -> list[DocumentChunk] | None:
+        with self._lock:
+            results = self._results.get(key)
+        self._record("result", results is not None)
+        return list(results) if results is not None else None
+
+    def put_results(self, key: tuple, results: list[DocumentChunk]) -> None:
+        with self._lock:
+            self._results[key] = list(results)
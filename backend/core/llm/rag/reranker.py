@@ -0,0 +1,135 @@
+import threading
+import time
+from dataclasses import replace
+
+from cachetools import TTLCache
+from loguru import logger
+from sentence_transformers import CrossEncoder
+
+from core.configs.deployment import deployment_settings
+from core.monitoring.rag import (
+    RAG_QUERY_CACHE_HITS,
+    RAG_QUERY_CACHE_MISSES,
+    RAG_RERANK_DURATION,
+    RAG_RERANK_FALLBACKS,
+)
+from .base import DocumentChunk
+from .query_cache import normalize_query
+
+# Вес последнего батча в оценке времени на одну пару
+PAIR_SECONDS_SMOOTHING = 0.3
+
+
+class CrossEncoderReranker:
+    """Переранжирование кандидатов поиска кросс-энкодером с бюджетом времени.
+
+    Бюджет общий на все запросы одного поиска. Пары (запрос, чанк) оцениваются
+    батчами, размер батча урезается до числа пар, которые по средней скорости
+    модели успеют до дедлайна. Если не успевает ни одна, для запроса остается
+    исходный порядок выдачи. Оценки кэшируются по нормализованному запросу и
+    идентификатору чанка: идентификатор зависит от текста, поэтому измененный
+    чанк получит новую оценку.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int,
+        budget_ms: int,
+        cache_size: int,
+        cache_ttl: int,
+    ):
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.batch_size = max(batch_size, 1)
+        self.budget = budget_ms / 1000
+        self._scores: TTLCache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._lock = threading.Lock()
+        self._pair_seconds = 0.0
+
+    def warmup(self, text: str) -> None:
+        self.model.predict([(text, text)])
+
+    def _predict(self, query: str, chunks: list[DocumentChunk]) -> list[float]:
+        start_time = time.perf_counter()
+        scores = self.model.predict(
+            [(query, chunk.content) for chunk in chunks],
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+        )
+        pair_seconds = (time.perf_counter() - start_time) / len(chunks)
+        with self._lock:
+            # Скользящее среднее, чтобы оценка следовала за нагрузкой на CPU
+            if self._pair_seconds:
+                pair_seconds = PAIR_SECONDS_SMOOTHING * pair_seconds + (1 - PAIR_SECONDS_SMOOTHING) * self._pair_seconds
+            self._pair_seconds = pair_seconds
+        return [float(score) for score in scores]
+
+    def _affordable_pairs(self, deadline: float) -> int:
+        """Сколько пар успеет оценить следующий батч до дедлайна."""
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return 0
+        with self._lock:
+            pair_seconds = self._pair_seconds
+        if not pair_seconds:
+            return self.batch_size
+        return min(self.batch_size, int(remaining / pair_seconds))
+
+    def rerank_many(
+        self,
+        queries: list[str],
+        results: list[list[DocumentChunk]],
+        k: int,
+    ) -> list[list[DocumentChunk]]:
+        deadline = time.perf_counter() + self.budget
+        return [self.rerank(query, chunks, k, deadline) for query, chunks in zip(queries, results)]
+
+    def rerank(
+        self,
+        query: str,
+        chunks: list[DocumentChunk],
+        k: int,
+        deadline: float | None = None,
+    ) -> list[DocumentChunk]:
+        if not chunks:
+            return []
+        service = deployment_settings.service_name
+        start_time = time.perf_counter()
+        deadline = deadline if deadline is not None else start_time + self.budget
+        key = normalize_query(query)
+        with self._lock:
+            scores = {chunk.id: self._scores.get((key, chunk.id)) for chunk in chunks}
+        missing = [chunk for chunk in chunks if scores[chunk.id] is None]
+        RAG_QUERY_CACHE_HITS.labels(service=service, cache="rerank").inc(len(chunks) - len(missing))
+        RAG_QUERY_CACHE_MISSES.labels(service=service, cache="rerank").inc(len(missing))
+
+        i = 0
+        while i < len(missing):
+            # Батч нельзя прервать, поэтому берем в него только пары, которые успеют до дедлайна
+            size = self._affordable_pairs(deadline)
+            if size == 0:
+                # Без батчей оценка не обновляется: снижаем ее, чтобы один медленный батч
+                # не отключил переранжирование навсегда
+                with self._lock:
+                    self._pair_seconds *= 1 - PAIR_SECONDS_SMOOTHING
+                RAG_RERANK_FALLBACKS.labels(service=service).inc()
+                logger.debug(
+                    f"Rerank budget exceeded after {(time.perf_counter() - start_time) * 1000:.0f} ms, "
+                    "keeping retrieval order"
+                )
+                return chunks[:k]
+            batch = missing[i:i + size]
+            i += size
+            batch_scores = self._predict(query, batch)
+            with self._lock:
+                for chunk, score in zip(batch, batch_scores):
+                    self._scores[(key, chunk.id)] = score
+                    scores[chunk.id] = score
+
+        # Чанки могут лежать в кэше выдач, поэтому оценку пишем в копии
+        ranked = [
+            replace(chunk, metadata={**(chunk.metadata or {}), "_rerank_score": scores[chunk.id]})
+            for chunk in sorted(chunks, key=lambda chunk: scores[chunk.id], reverse=True)[:k]
+        ]
+        RAG_RERANK_DURATION.labels(service=service).observe(time.perf_counter() - start_time)
+        return ranked
@@ -0,0 +1,159 @@
+import re
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+
+# Конец предложения или абзаца. Сокращения вроде «т. е.» иногда режутся, это
+# безопасно: соседние предложения без смыслового скачка все равно склеятся.
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?…])\s+|\n\s*\n")
+
+
+@dataclass(slots=True)
+class SemanticChunk:
+    content: str
+    embedding: list[float]
+
+
+def _hard_split(word: str, fits: Callable[[str], bool]) -> list[str]:
+    """Порезать строку без пробелов на самые длинные подходящие префиксы."""
+    pieces = []
+    while word:
+        # Бинарный поиск длины префикса: хотя бы один символ берем всегда
+        low, high = 1, len(word)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if fits(word[:middle]):
+                low = middle
+            else:
+                high = middle - 1
+        pieces.append(word[:low])
+        word = word[low:]
+    return pieces
+
+
+def _split_long(sentence: str, fits: Callable[[str], bool]) -> list[str]:
+    """Порезать предложение по словам на подходящие части, слишком длинные слова — по символам."""
+    pieces: list[str] = []
+    words: list[str] = []
+    for word in sentence.split():
+        if not fits(word):
+            if words:
+                pieces.append(" ".join(words))
+                words = []
+            pieces.extend(_hard_split(word, fits))
+            continue
+        if words and not fits(" ".join([*words, word])):
+            pieces.append(" ".join(words))
+            words = []
+        words.append(word)
+    if words:
+        pieces.append(" ".join(words))
+    return pieces
+
+
+def split_sentences(text: str, fits: Callable[[str], bool]) -> list[str]:
+    """Разбить текст на предложения, не подходящие по `fits` порезать на части."""
+    sentences = []
+    for sentence in SENTENCE_PATTERN.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if fits(sentence):
+            sentences.append(sentence)
+        else:
+            sentences.extend(_split_long(sentence, fits))
+    return sentences
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class SemanticChunker:
+    """Семантическое разбиение за один проход модели.
+
+    Каждое предложение кодируется один раз. Границы чанков ставятся там, где
+    косинусное расстояние между соседними предложениями выше перцентиля
+    `breakpoint_percentile`, с учетом ограничений `min_size` и `max_size`.
+    Вектор чанка — среднее векторов его предложений, взвешенное по длине,
+    поэтому чанки повторно не кодируются. Предложения длиннее `max_size` или
+    окна модели `window` (по ее токенизатору `count_tokens`) заранее режутся
+    на части, поэтому модель не обрезает ни одно предложение.
+
+    Разбиение идет в два шага: `sentences` режет текст, `group` собирает чанки по
+    готовым векторам предложений. Между ними векторы можно посчитать где угодно,
+    например в общем батчере эмбеддингов конвейера индексации.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[list[str]], list[list[float]]],
+        count_tokens: Callable[[str], int],
+        window: int,
+        max_size: int,
+        min_size: int,
+        breakpoint_percentile: float = 95.0,
+        length_function: Callable[[str], int] = len,
+    ):
+        self.encode = encode
+        self.count_tokens = count_tokens
+        self.window = window
+        self.max_size = max_size
+        self.min_size = min_size
+        self.breakpoint_percentile = breakpoint_percentile
+        self.length_function = length_function
+
+    def _breakpoints(self, embeddings: np.ndarray) -> np.ndarray:
+        """Маска длины n-1: True, если между предложениями i и i+1 смысловой скачок."""
+        if len(embeddings) < 2:
+            return np.zeros(0, dtype=bool)
+        distances = 1.0 - np.einsum("ij,ij->i", embeddings[:-1], embeddings[1:])
+        return distances > np.percentile(distances, self.breakpoint_percentile)
+
+    def _fits(self, text: str) -> bool:
+        return self.length_function(text) <= self.max_size and self.count_tokens(text) <= self.window
+
+    def sentences(self, text: str) -> list[str]:
+        return split_sentences(text, self._fits)
+
+    def split_text(self, text: str) -> list[SemanticChunk]:
+        sentences = self.sentences(text)
+        if not sentences:
+            return []
+        return self.group(sentences, self.encode(sentences))
+
+    def group(self, sentences: list[str], sentence_embeddings: list[list[float]]) -> list[SemanticChunk]:
+        """Собрать чанки из предложений по их векторам."""
+        if not sentences:
+            return []
+        embeddings = _normalize(np.asarray(sentence_embeddings, dtype=np.float32))
+        breakpoints = self._breakpoints(embeddings)
+        lengths = np.asarray([self.length_function(sentence) for sentence in sentences], dtype=np.float32)
+
+        # Границы групп: [start, end) по индексам предложений
+        groups: list[tuple[int, int]] = []
+        start, size = 0, lengths[0]
+        for i in range(1, len(sentences)):
+            # +1 — пробел между предложениями
+            too_large = size + 1 + lengths[i] > self.max_size
+            if too_large or (breakpoints[i - 1] and size >= self.min_size):
+                groups.append((start, i))
+                start, size = i, lengths[i]
+            else:
+                size += 1 + lengths[i]
+        groups.append((start, len(sentences)))
+
+        chunks = []
+        for start, end in groups:
+            if end - start == 1:
+                embedding = embeddings[start]
+            else:
+                weights = lengths[start:end, None]
+                embedding = _normalize((embeddings[start:end] * weights).sum(axis=0) / weights.sum())
+            chunks.append(SemanticChunk(
+                content=" ".join(sentences[start:end]),
+                embedding=embedding.tolist(),
+            ))
+        return chunks
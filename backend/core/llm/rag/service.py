@@ -0,0 +1,60 @@
+import asyncio
+import threading
+
+from loguru import logger
+
+from core.configs.rag import rag_settings
+from .base import DocumentChunk, RAGBase
+
+
+_rag: RAGBase | None = None
+_rag_lock = threading.Lock()
+
+
+def get_rag() -> RAGBase:
+    """Вернуть RAG движок, общий на весь процесс.
+
+    Модель эмбеддингов и клиент Qdrant загружаются один раз при первом вызове
+    и переиспользуются всеми последующими запросами на индексацию и поиск.
+    Вызов потокобезопасен: параллельные первые вызовы ждут одну загрузку.
+    """
+    global _rag
+    if _rag is not None:
+        return _rag
+    with _rag_lock:
+        if _rag is None:
+            if rag_settings.vector_store == "numpy":
+                from .numpy_mmap import RAGNumpy
+
+                rag = RAGNumpy()
+            else:
+                from .langchain_qdrant import RAGLangChain
+
+                rag = RAGLangChain()
+            rag.warmup()
+            _rag = rag
+    return _rag
+
+
+async def search_user_context(
+    query: str,
+    user_id: int,
+    document_ids: list[int] | None = None,
+) -> list[DocumentChunk]:
+    """Найти материалы для генерации в документах пользователя.
+
+    Ошибка поиска не должна ломать генерацию, в этом случае материалов просто нет.
+    """
+    if not rag_settings.generation_context_enabled:
+        return []
+    try:
+        rag = await asyncio.to_thread(get_rag)
+        return await rag.asearch(
+            query,
+            k=rag_settings.generation_context_chunks,
+            user_id=user_id,
+            document_ids=[str(document_id) for document_id in document_ids] if document_ids is not None else None,
+        )
+    except Exception as e:
+        logger.warning(f"Failed to search user documents for generation context: {str(e)}")
+        return []
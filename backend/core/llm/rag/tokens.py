@@ -0,0 +1,55 @@
+import math
+
+# Средняя длина токена sentencepiece-токенизаторов на смешанном русско-английском тексте
+CHARS_PER_TOKEN = 4
+
+# Оценка сверху для токенизаторов LLM: ASCII ~4 символа на токен, кириллица и
+# прочие символы дробятся мельче, для них берем 2 символа на токен
+ASCII_CHARS_PER_PROMPT_TOKEN = 4
+OTHER_CHARS_PER_PROMPT_TOKEN = 2
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов в тексте без загрузки токенизатора."""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def estimate_prompt_tokens(text: str) -> int:
+    """Оценка токенов промпта LLM с запасом, чтобы бюджет не превышался на кириллице."""
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return math.ceil(
+        ascii_chars / ASCII_CHARS_PER_PROMPT_TOKEN
+        + (len(text) - ascii_chars) / OTHER_CHARS_PER_PROMPT_TOKEN
+    )
+
+
+def truncate_to_prompt_tokens(text: str, max_tokens: int) -> str:
+    """Самый длинный префикс текста, укладывающийся в `max_tokens` по `estimate_prompt_tokens`."""
+    if estimate_prompt_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_prompt_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low]
+
+
+class TokenCounter:
+    """Длина текста в токенах модели эмбеддингов, по ее собственному токенизатору."""
+
+    def __init__(self, model):
+        # model — SentenceTransformer: токенизатор и окно берутся у него
+        self.tokenizer = model.tokenizer
+        # Служебные токены начала и конца тоже занимают окно
+        self.window = model.max_seq_length - 2
+
+    def __call__(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def count_many(self, texts: list[str]) -> list[int]:
+        if not texts:
+            return []
+        return [len(ids) for ids in self.tokenizer(texts, add_special_tokens=False)["input_ids"]]
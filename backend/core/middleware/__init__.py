@@ -1,2 +1,3 @@
 from .auth import auth_middleware
 from .monitoring import update_metrics_middleware
+from .uploads import upload_size_middleware
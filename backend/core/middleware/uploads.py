@@ -0,0 +1,30 @@
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from core.configs.backend import backend_settings
+from core.files import file_too_large_message
+
+
+# Запас на границы multipart и текстовые поля формы помимо самого файла
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Маршруты загрузки документов, на которые распространяется лимит max_file_size
+UPLOAD_ROUTES = {("POST", "/api/documents")}
+
+
+async def upload_size_middleware(request: Request, call_next):
+    """Отклонять заведомо слишком большие загрузки документов по Content-Length, не читая тело запроса"""
+    if (request.method, request.url.path) not in UPLOAD_ROUTES:
+        return await call_next(request)
+    content_type = request.headers.get("content-type", "")
+    content_length = request.headers.get("content-length")
+    if (
+        content_type.startswith("multipart/form-data")
+        and content_length is not None
+        and content_length.isdigit()
+        and int(content_length) > backend_settings.max_file_size + MULTIPART_OVERHEAD
+    ):
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"detail": file_too_large_message(backend_settings.max_file_size, int(content_length))}
+        )
+    return await call_next(request)
@@ -0,0 +1,19 @@
+from prometheus_client import Gauge, Histogram
+
+
+S3_REQUEST_DURATION = Histogram(
+    "s3_request_duration_seconds",
+    "S3 request duration including body transfer",
+    ["service", "operation", "status"],
+    buckets=[0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0],
+)
+S3_REQUESTS_IN_PROGRESS = Gauge(
+    "s3_requests_in_progress",
+    "S3 requests currently holding a pooled connection",
+    ["service"],
+)
+S3_POOL_SATURATION = Gauge(
+    "s3_pool_saturation_ratio",
+    "Share of the S3 connection pool in use",
+    ["service"],
+)
@@ -0,0 +1,98 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+
+RAG_MODEL_LOAD_SECONDS = Gauge(
+    "rag_model_load_seconds",
+    "Time spent loading the embedding model",
+    ["service", "model"],
+)
+RAG_MODEL_WARMUP_SECONDS = Gauge(
+    "rag_model_warmup_seconds",
+    "Time spent on the warmup encode of the embedding model",
+    ["service", "model"],
+)
+RAG_MODEL_MEMORY_BYTES = Gauge(
+    "rag_model_memory_bytes",
+    "Resident memory added by loading the embedding model",
+    ["service", "model"],
+)
+RAG_EMBED_BATCH_CHUNKS = Histogram(
+    "rag_embed_batch_chunks",
+    "Number of chunks encoded in one embedding call",
+    ["service"],
+    buckets=[1, 4, 16, 32, 64, 128, 256, 512, 1024],
+)
+RAG_EMBED_BATCH_TOKENS = Histogram(
+    "rag_embed_batch_tokens",
+    "Estimated number of tokens encoded in one embedding call",
+    ["service"],
+    buckets=[128, 512, 1024, 2048, 4096, 8192, 16384, 32768],
+)
+RAG_EMBED_BATCH_DURATION = Histogram(
+    "rag_embed_batch_duration_seconds",
+    "Duration of one batched embedding call",
+    ["service"],
+    buckets=[0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0],
+)
+RAG_EMBEDDING_CACHE_HITS = Counter(
+    "rag_embedding_cache_hits_total",
+    "Number of chunk embeddings served from the embedding cache",
+    ["service"],
+)
+RAG_EMBEDDING_CACHE_MISSES = Counter(
+    "rag_embedding_cache_misses_total",
+    "Number of chunk embeddings missing in the embedding cache",
+    ["service"],
+)
+RAG_EMBEDDING_CACHE_EVICTIONS = Counter(
+    "rag_embedding_cache_evictions_total",
+    "Number of entries evicted from the embedding cache",
+    ["service"],
+)
+RAG_EMBEDDING_CACHE_ENTRIES = Gauge(
+    "rag_embedding_cache_entries",
+    "Current number of entries in the embedding cache",
+    ["service"],
+)
+RAG_QUERY_CACHE_HITS = Counter(
+    "rag_query_cache_hits_total",
+    "Number of search lookups served from the query caches",
+    ["service", "cache"],
+)
+RAG_QUERY_CACHE_MISSES = Counter(
+    "rag_query_cache_misses_total",
+    "Number of search lookups missing in the query caches",
+    ["service", "cache"],
+)
+RAG_QUERY_ENCODE_SAVED_SECONDS = Counter(
+    "rag_query_encode_saved_seconds_total",
+    "Estimated query encode time saved by cache hits",
+    ["service"],
+)
+RAG_RERANK_DURATION = Histogram(
+    "rag_rerank_duration_seconds",
+    "Duration of cross-encoder reranking that finished within the budget",
+    ["service"],
+    buckets=[0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.5],
+)
+RAG_RERANK_FALLBACKS = Counter(
+    "rag_rerank_fallbacks_total",
+    "Number of searches that exceeded the rerank budget and kept the retrieval order",
+    ["service"],
+)
+RAG_CHUNK_TOKENS = Histogram(
+    "rag_chunk_tokens",
+    "Number of embedding model tokens in one indexed chunk",
+    ["service"],
+    buckets=[16, 32, 64, 96, 128, 192, 256, 384, 512, 1024],
+)
+RAG_CHUNKS_TRUNCATED = Counter(
+    "rag_chunks_truncated_total",
+    "Number of chunks longer than the embedding model window",
+    ["service"],
+)
+RAG_TRUNCATED_TOKENS = Counter(
+    "rag_truncated_tokens_total",
+    "Number of chunk tokens dropped by the embedding model window",
+    ["service"],
+)
@@ -41,6 +41,7 @@ async def generate_block_content(
         user_id=user_id,
         user_request=generate_request.user_request,
         context=generate_request.context,
+        document_ids=generate_request.document_ids,
     )
 
     return GenerateLessonBlockContentResponse(block=block)
@@ -30,6 +30,7 @@ async def generate_lesson_content(
         context=generate_request.context,
         goal=generate_request.goal,
         focus_points=generate_request.focus_points,
+        document_ids=generate_request.document_ids,
     )
     
     return GenerateLessonContentResponse(blocks=blocks)
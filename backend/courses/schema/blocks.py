@@ -238,6 +238,10 @@ class GenerateLessonBlockContentRequest(BaseModel):
         default=None,
         description="Конспект или материалы, на основе которых нужно создать урок",
     )
+    document_ids: list[int] | None = Field(
+        default=None,
+        description="Документы пользователя, из которых брать материалы. По умолчанию все документы",
+    )
 
 
 class GenerateLessonBlockContentResponse(BaseModel):
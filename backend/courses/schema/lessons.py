@@ -74,6 +74,10 @@ class GenerateLessonContentRequest(BaseModel):
     focus_points: list[str] | None = Field(
         default=None, description="Ключевые аспекты, которые обязательно нужно раскрыть"
     )
+    document_ids: list[int] | None = Field(
+        default=None,
+        description="Документы пользователя, из которых брать материалы. По умолчанию все документы",
+    )
 
 
 class GenerateLessonContentResponse(BaseModel):
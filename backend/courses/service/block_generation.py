@@ -3,6 +3,7 @@ from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.llm.blocks.service import generate_lesson_block
 from core.llm.blocks.schema import LessonBlockGenerateContext
+from core.llm.rag.service import search_user_context
 from courses.service.access_control import ensure_course_access
 from courses.dao import LessonDAO, LessonBlockDAO, CourseDAO
 from courses.schema.blocks import LessonBlock, db_block_to_schema, build_block_context
@@ -19,6 +20,7 @@ async def generate_lesson_block_content(
     user_id: int,
     user_request: str | None = None,
     context: str | None = None,
+    document_ids: list[int] | None = None,
 ) -> LessonBlock:
     """Сгенерировать или переформулировать контент для одного блока урока."""
     # Проверяем, что пользователь является автором курса
@@ -93,6 +95,10 @@ async def generate_lesson_block_content(
         f"in lesson {lesson_id} (topic: {lesson.name}) in course {course_id}"
     )
 
+    # Материалы ищем в проиндексированных документах пользователя по запросу и теме урока
+    query = "\n".join(part for part in [user_request, lesson.name, lesson.description] if part)
+    retrieved_chunks = await search_user_context(query, user_id, document_ids)
+
     # Создаем контекст для генерации
     generate_context = LessonBlockGenerateContext(
         course_name=course.name,
@@ -105,6 +111,7 @@ async def generate_lesson_block_content(
         current_block=current_block_dict,
         next_block=next_block_dict,
         block_type=current_block.type,  # Сохраняем тип текущего блока
+        retrieved_chunks=retrieved_chunks,
     )
 
     # Генерируем блок
@@ -3,6 +3,7 @@ from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.llm.lessons.service import generate_lesson_blocks
 from core.llm.lessons.schema import LessonBlocksGenerateContext
+from core.llm.rag.service import search_user_context
 from courses.service.access_control import ensure_course_access
 from courses.dao import LessonDAO
 from courses.schema.blocks import LessonBlock
@@ -18,6 +19,7 @@ async def generate_lesson_content(
     context: str | None = None,
     goal: str | None = None,
     focus_points: list[str] | None = None,
+    document_ids: list[int] | None = None,
 ) -> list[LessonBlock]:
     # Проверяем, что пользователь является автором курса
     await ensure_course_access(db, course_id, user_id, require_author=True)
@@ -33,12 +35,17 @@ async def generate_lesson_content(
     
     logger.info(f"User {user_id} generating lesson content for lesson {lesson_id} (topic: {topic}) in course {course_id}")
     
+    # Материалы ищем в проиндексированных документах пользователя по теме урока
+    query = "\n".join(part for part in [topic, description, goal, *(focus_points or [])] if part)
+    retrieved_chunks = await search_user_context(query, user_id, document_ids)
+
     generate_context = LessonBlocksGenerateContext(
         topic=topic,
         description=description,
         context=context,
         goal=goal,
         focus_points=focus_points,
+        retrieved_chunks=retrieved_chunks,
     )
     generated_content = await generate_lesson_blocks(generate_context)
     
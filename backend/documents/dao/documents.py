@@ -1,6 +1,8 @@
+from datetime import timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, func
+from sqlalchemy import select, update, func, or_
 
+from core.configs.rag import rag_settings
 from .models import Document, DocumentStatus
 
 
@@ -50,6 +52,87 @@ class DocumentDAO:
         )
         return list(result.scalars().all())
 
+    @classmethod
+    async def claim_unindexed(
+        cls,
+        session: AsyncSession,
+        lease_owner: str,
+        limit: int,
+        lease_seconds: int,
+    ) -> list[Document]:
+        """Захватить неиндексированные документы без активной аренды.
+
+        Строки, которые в этот момент захватывает другой воркер, пропускаются (SKIP LOCKED),
+        поэтому несколько реплик индексатора не берут один и тот же документ.
+        """
+        claimable = (
+            select(Document.id)
+            .where(
+                Document.status.in_([DocumentStatus.UPLOADED, DocumentStatus.INDEXING]),
+                or_(
+                    Document.lease_expires_at.is_(None),
+                    Document.lease_expires_at < func.now(),
+                ),
+            )
+            .order_by(Document.created_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(Document)
+            .where(Document.id.in_(claimable))
+            .values(
+                status=DocumentStatus.INDEXING,
+                lease_owner=lease_owner,
+                lease_expires_at=func.now() + timedelta(seconds=lease_seconds),
+                heartbeat_at=func.now(),
+            )
+            .returning(Document)
+            .execution_options(synchronize_session=False)
+        )
+        result = await session.execute(stmt)
+        return list(result.scalars().all())
+
+    @classmethod
+    async def extend_leases(
+        cls,
+        session: AsyncSession,
+        document_ids: list[int],
+        lease_owner: str,
+        lease_seconds: int,
+    ) -> None:
+        stmt = (
+            update(Document)
+            .where(
+                Document.id.in_(document_ids),
+                Document.lease_owner == lease_owner,
+            )
+            .values(
+                lease_expires_at=func.now() + timedelta(seconds=lease_seconds),
+                heartbeat_at=func.now(),
+            )
+        )
+        await session.execute(stmt)
+        await session.flush()
+
+    @classmethod
+    async def release_leases(
+        cls,
+        session: AsyncSession,
+        document_ids: list[int],
+        lease_owner: str,
+    ) -> None:
+        stmt = (
+            update(Document)
+            .where(
+                Document.id.in_(document_ids),
+                Document.lease_owner == lease_owner,
+            )
+            .values(lease_owner=None, lease_expires_at=None)
+        )
+        await session.execute(stmt)
+        await session.flush()
+
     @classmethod
     async def create(
         cls,
@@ -72,20 +155,33 @@ class DocumentDAO:
         await session.refresh(db_document)
         return db_document
 
+    @classmethod
+    async def notify_uploaded(cls, session: AsyncSession, document_id: int) -> None:
+        """Оповестить индексатор о новом документе. Postgres доставит NOTIFY только после коммита."""
+        await session.execute(
+            select(func.pg_notify(rag_settings.indexer_notify_channel, str(document_id)))
+        )
+
     @classmethod
     async def mark_as_indexed(
         cls,
         session: AsyncSession,
-        document_id: int
+        document_id: int,
+        lease_owner: str | None = None
     ) -> Document | None:
         stmt = (
             update(Document)
             .where(Document.id == document_id)
             .values(
                 indexed_at=func.now(),
-                status=DocumentStatus.FINISHED
+                status=DocumentStatus.FINISHED,
+                lease_owner=None,
+                lease_expires_at=None
             )
         )
+        if lease_owner is not None:
+            # Если аренду уже перехватил другой воркер, результат остается за ним
+            stmt = stmt.where(Document.lease_owner == lease_owner)
         await session.execute(stmt)
         await session.flush()
         return await cls.get_by_id(session, document_id)
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import socket
+import uuid
+
+from loguru import logger
+
+from core.configs.rag import rag_settings
+from core.db.sqlalchemy import AsyncSessionLocal
+from documents.dao import DocumentDAO
+from documents.dao.models import Document
+
+
+def make_lease_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class DocumentLeaseKeeper:
+    """Аренда документов одним воркером индексатора.
+
+    Захваченные документы продлеваются heartbeat'ом, пока они в работе. Если воркер
+    упал, аренда истекает и документ подбирает другая реплика. Для упавших при
+    индексации документов аренда не снимается: повторная попытка случится
+    после ее истечения.
+    """
+
+    def __init__(self, owner: str | None = None):
+        self.owner = owner or make_lease_owner()
+        self.in_flight: set[int] = set()
+        self._heartbeat_task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self) -> None:
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+            self._heartbeat_task = None
+        # Отдаем недоделанные документы другим репликам сразу, не дожидаясь истечения аренды
+        if self.in_flight:
+            async with AsyncSessionLocal() as session:
+                await DocumentDAO.release_leases(session, list(self.in_flight), self.owner)
+                await session.commit()
+            self.in_flight.clear()
+
+    async def claim(self, limit: int) -> list[Document]:
+        async with AsyncSessionLocal() as session:
+            documents = await DocumentDAO.claim_unindexed(
+                session,
+                lease_owner=self.owner,
+                limit=limit,
+                lease_seconds=rag_settings.indexer_lease_seconds,
+            )
+            await session.commit()
+        self.in_flight.update(document.id for document in documents)
+        return documents
+
+    async def complete(self, document_id: int) -> None:
+        async with AsyncSessionLocal() as session:
+            await DocumentDAO.mark_as_indexed(session, document_id, lease_owner=self.owner)
+            await session.commit()
+        self.in_flight.discard(document_id)
+
+    def abandon(self, document_id: int) -> None:
+        self.in_flight.discard(document_id)
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(rag_settings.indexer_heartbeat_interval)
+            if not self.in_flight:
+                continue
+            try:
+                async with AsyncSessionLocal() as session:
+                    await DocumentDAO.extend_leases(
+                        session,
+                        list(self.in_flight),
+                        lease_owner=self.owner,
+                        lease_seconds=rag_settings.indexer_lease_seconds,
+                    )
+                    await session.commit()
+            except Exception as e:
+                logger.exception(f"Failed to extend document leases: {str(e)}")
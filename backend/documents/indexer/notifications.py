@@ -0,0 +1,57 @@
+import asyncio
+
+import asyncpg
+from loguru import logger
+
+from core.configs.db import db_settings
+
+
+def get_asyncpg_dsn(database_uri: str) -> str:
+    """asyncpg не понимает sqlalchemy-схему postgresql+asyncpg://"""
+    return database_uri.replace("postgresql+asyncpg://", "postgresql://")
+
+
+class DocumentNotificationListener:
+    """Подписка на NOTIFY о загруженных документах через LISTEN.
+
+    Если соединение с Postgres потеряно, ожидание продолжает работать по таймауту,
+    а при следующем ожидании выполняется попытка переподключиться.
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self._event = asyncio.Event()
+        self._connection: asyncpg.Connection | None = None
+
+    async def connect(self) -> None:
+        try:
+            self._connection = await asyncpg.connect(get_asyncpg_dsn(db_settings.database_uri))
+            await self._connection.add_listener(self.channel, self._on_notification)
+            logger.info(f"Listening for document notifications on channel '{self.channel}'")
+        except Exception as e:
+            self._connection = None
+            logger.warning(f"Failed to subscribe to channel '{self.channel}', falling back to polling: {str(e)}")
+
+    async def close(self) -> None:
+        if self.connected:
+            await self._connection.close()
+        self._connection = None
+
+    @property
+    def connected(self) -> bool:
+        return self._connection is not None and not self._connection.is_closed()
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        logger.info(f"Got notification about document {payload}")
+        self._event.set()
+
+    async def wait(self, timeout: float) -> None:
+        """Дождаться уведомления о новом документе, но не дольше `timeout` секунд."""
+        if not self.connected:
+            await self.connect()
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        # Уведомления, пришедшие во время обработки, снова выставят флаг и разбудят следующее ожидание
+        self._event.clear()
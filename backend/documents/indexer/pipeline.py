@@ -0,0 +1,250 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Awaitable, BinaryIO, Callable
+
+from loguru import logger
+
+from core.configs.rag import rag_settings
+from core.files import files_repository
+from core.llm.rag.base import DocumentChunk, DocumentExtension, DocumentPage, RAGBase
+from core.llm.rag.batching import EmbeddingBatcher
+from core.llm.rag.extraction import PageExtractor
+
+
+@dataclass
+class IndexingJob:
+    document_id: int
+    s3_path: str
+    filename: str
+    user_id: int
+    extension: DocumentExtension
+    source: BinaryIO | None = None
+    existing_ids: set[str] = field(default_factory=set)
+    chunk_ids: set[str] = field(default_factory=set)
+    pending_batches: int = 0
+    parsed: bool = False
+    failed: bool = False
+    finished: bool = False
+
+
+@dataclass
+class ChunkBatch:
+    """Порция чанков одного документа, которая идет через стадии эмбеддинга и записи."""
+    job: IndexingJob
+    chunks: list[DocumentChunk]
+
+
+JobCallback = Callable[[IndexingJob], Awaitable[None]]
+
+
+class IndexingPipeline:
+    """Конвейер индексации: скачивание -> парсинг -> эмбеддинги -> запись в Qdrant.
+
+    Между стадиями стоят ограниченные очереди, поэтому медленная стадия
+    притормаживает предыдущие, а не копит документы в памяти. Пока один документ
+    скачивается из S3, другой уже парсится, а третий считается моделью.
+    Текст извлекается в пуле процессов диапазонами страниц и уходит дальше
+    порциями чанков, поэтому память на документ не растет с числом страниц.
+    """
+
+    def __init__(
+        self,
+        rag: RAGBase,
+        on_indexed: JobCallback,
+        on_failed: JobCallback,
+    ):
+        self.rag = rag
+        self.on_indexed = on_indexed
+        self.on_failed = on_failed
+
+        queue_size = rag_settings.indexer_queue_size
+        self.download_queue: asyncio.Queue[IndexingJob] = asyncio.Queue(maxsize=queue_size)
+        self.parse_queue: asyncio.Queue[IndexingJob] = asyncio.Queue(maxsize=queue_size)
+        self.embed_queue: asyncio.Queue[ChunkBatch] = asyncio.Queue(maxsize=queue_size)
+        self.upsert_queue: asyncio.Queue[ChunkBatch] = asyncio.Queue(maxsize=queue_size)
+
+        self.parse_executor = ThreadPoolExecutor(
+            max_workers=rag_settings.indexer_parse_workers,
+            thread_name_prefix="indexer-parse",
+        )
+        self.extractor = PageExtractor(
+            workers=rag_settings.indexer_extract_workers,
+            pages_per_task=rag_settings.indexer_extract_pages_per_task,
+        )
+        self.embed_executor = ThreadPoolExecutor(
+            max_workers=rag_settings.indexer_embed_workers,
+            thread_name_prefix="indexer-embed",
+        )
+        self.batcher = EmbeddingBatcher(
+            embed_fn=rag.embed_texts,
+            max_batch_tokens=rag_settings.embed_batch_tokens,
+            max_wait_ms=rag_settings.embed_batch_max_wait_ms,
+            workers=rag_settings.indexer_embed_workers,
+            executor=self.embed_executor,
+        )
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        self.batcher.start()
+        stages = [
+            (self._download_worker, rag_settings.indexer_download_concurrency),
+            (self._parse_worker, rag_settings.indexer_parse_workers),
+            (self._embed_worker, rag_settings.indexer_embed_concurrency),
+            (self._upsert_worker, rag_settings.indexer_upsert_concurrency),
+        ]
+        for worker, concurrency in stages:
+            for _ in range(concurrency):
+                self._tasks.append(asyncio.create_task(worker()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        await self.batcher.stop()
+        self.parse_executor.shutdown(wait=False, cancel_futures=True)
+        self.extractor.shutdown()
+        self.embed_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def submit(self, job: IndexingJob) -> None:
+        """Поставить документ в очередь. Ждет, если конвейер заполнен."""
+        await self.download_queue.put(job)
+
+    async def join(self) -> None:
+        """Дождаться, пока все поставленные документы пройдут все стадии."""
+        for queue in (self.download_queue, self.parse_queue, self.embed_queue, self.upsert_queue):
+            await queue.join()
+
+    @staticmethod
+    def _release_source(job: IndexingJob) -> None:
+        # Закрытие буфера удаляет временный файл, если документ был выгружен на диск
+        if job.source is not None:
+            job.source.close()
+            job.source = None
+
+    async def _fail(self, job: IndexingJob, stage: str, error: Exception) -> None:
+        self._release_source(job)
+        if job.failed:
+            return
+        job.failed = True
+        logger.opt(exception=error).error(
+            f"Failed to {stage} document {job.document_id}: {str(error)}"
+        )
+        try:
+            await self.on_failed(job)
+        except Exception as e:
+            logger.exception(f"Failed to handle failure of document {job.document_id}: {str(e)}")
+
+    async def _finish_if_done(self, job: IndexingJob) -> None:
+        if not job.parsed or job.pending_batches > 0 or job.failed or job.finished:
+            return
+        job.finished = True
+        try:
+            if job.existing_ids - job.chunk_ids:
+                # Удаляем устаревшие точки только после записи новых
+                await self.rag.adelete_document(str(job.document_id), keep_ids=job.chunk_ids)
+            await self.on_indexed(job)
+        except Exception as e:
+            await self._fail(job, "finish", e)
+
+    async def _download_worker(self) -> None:
+        while True:
+            job = await self.download_queue.get()
+            try:
+                job.source = await files_repository.download_to_file(job.s3_path)
+                await self.parse_queue.put(job)
+            except Exception as e:
+                await self._fail(job, "download", e)
+            finally:
+                self.download_queue.task_done()
+
+    async def _parse_worker(self) -> None:
+        batch_size = rag_settings.indexer_chunk_batch_size
+        while True:
+            job = await self.parse_queue.get()
+            try:
+                # Чанки с тем же идентификатором уже лежат в коллекции, считаем только новые
+                job.existing_ids = await self.rag.aget_chunk_ids(str(job.document_id))
+                chunk_index = 0
+                async for pages in self.extractor.iter_page_batches(job.source, job.extension):
+                    chunks = await self._split(job, pages, chunk_index)
+                    chunk_index += len(chunks)
+                    job.chunk_ids.update(chunk.id for chunk in chunks)
+                    new_chunks = [chunk for chunk in chunks if chunk.id not in job.existing_ids]
+                    for start in range(0, len(new_chunks), batch_size):
+                        job.pending_batches += 1
+                        await self.embed_queue.put(ChunkBatch(job=job, chunks=new_chunks[start:start + batch_size]))
+                    if job.failed:
+                        break
+                self._release_source(job)
+                job.parsed = True
+                await self._finish_if_done(job)
+            except Exception as e:
+                await self._fail(job, "parse", e)
+            finally:
+                self.parse_queue.task_done()
+
+    async def _split(self, job: IndexingJob, pages: list[DocumentPage], chunk_index: int) -> list[DocumentChunk]:
+        loop = asyncio.get_running_loop()
+        if not self.rag.chunks_by_sentences:
+            return await loop.run_in_executor(
+                self.parse_executor,
+                self.rag.split_pages,
+                pages,
+                str(job.document_id),
+                job.user_id,
+                chunk_index,
+            )
+        # Семантическому чанкеру нужны векторы предложений. Они считаются тем же батчером,
+        # что и чанки, вместе с другими документами и в потоке модели, а не в потоках парсинга
+        sentence_pages = await loop.run_in_executor(self.parse_executor, self.rag.split_sentences, pages)
+        embeddings = await self.batcher.embed([sentence for item in sentence_pages for sentence in item.sentences])
+        start = 0
+        for item in sentence_pages:
+            item.embeddings = embeddings[start:start + len(item.sentences)]
+            start += len(item.sentences)
+        return await loop.run_in_executor(
+            self.parse_executor,
+            self.rag.split_sentence_pages,
+            sentence_pages,
+            str(job.document_id),
+            job.user_id,
+            chunk_index,
+        )
+
+    async def _embed_worker(self) -> None:
+        while True:
+            batch = await self.embed_queue.get()
+            forwarded = False
+            try:
+                if not batch.job.failed:
+                    # Чанки нескольких документов склеиваются батчером в один вызов модели.
+                    # Чанки семантического чанкера приходят уже с векторами.
+                    missing = [chunk for chunk in batch.chunks if chunk.embedding is None]
+                    embeddings = await self.batcher.embed([chunk.content for chunk in missing])
+                    for chunk, embedding in zip(missing, embeddings):
+                        chunk.embedding = embedding
+                    await self.upsert_queue.put(batch)
+                    forwarded = True
+            except Exception as e:
+                await self._fail(batch.job, "embed", e)
+            finally:
+                if not forwarded:
+                    batch.job.pending_batches -= 1
+                self.embed_queue.task_done()
+
+    async def _upsert_worker(self) -> None:
+        while True:
+            batch = await self.upsert_queue.get()
+            try:
+                if not batch.job.failed:
+                    await self.rag.aupsert_chunks(batch.chunks)
+            except Exception as e:
+                await self._fail(batch.job, "upsert", e)
+            finally:
+                batch.job.pending_batches -= 1
+            try:
+                await self._finish_if_done(batch.job)
+            finally:
+                self.upsert_queue.task_done()
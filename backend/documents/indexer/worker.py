@@ -1,10 +1,13 @@
 import asyncio
 from loguru import logger
-from core.db.sqlalchemy import AsyncSessionLocal
-from documents.dao import DocumentDAO
-from core.llm.rag.langchain_qdrant import RAGLangChain
-from core.llm.rag.base import DocumentExtension
+from documents.indexer.leases import DocumentLeaseKeeper
+from documents.indexer.notifications import DocumentNotificationListener
+from documents.indexer.pipeline import IndexingJob, IndexingPipeline
+from core.configs.rag import rag_settings
 from core.files import files_repository
+from core.llm.rag.base import DocumentExtension
+from core.llm.rag.service import get_rag
+from core.monitoring.requests import start_metrics_server, update_system_metrics
 
 
 def get_file_extension(filename: str) -> DocumentExtension:
@@ -16,12 +19,11 @@ def get_file_extension(filename: str) -> DocumentExtension:
 
 async def wait_for_qdrant(max_retries: int = 10, delay: int = 5):
     """Ожидание доступности Qdrant перед началом работы"""
-    from qdrant_client import QdrantClient
-    from core.configs.rag import qdrant_settings
-    
+    from core.llm.rag.qdrant_collection import create_qdrant_client
+
     for attempt in range(max_retries):
         try:
-            client = QdrantClient(url=qdrant_settings.host)
+            client = create_qdrant_client()
             # Проверяем доступность через получение списка коллекций
             client.get_collections()
             logger.info("Qdrant is available")
@@ -36,69 +38,81 @@ async def wait_for_qdrant(max_retries: int = 10, delay: int = 5):
     return False
 
 
-async def index_document(document_id: int, s3_path: str, filename: str, user_id: int):
-    try:
-        document_bytes = await files_repository.download_file(s3_path)
-    except Exception as e:
-        logger.exception(f"Failed to download document {document_id} from S3: {str(e)}")
-        return False
-    
-    extension = get_file_extension(filename)
-    
-    try:
-        rag = RAGLangChain()
-    except Exception as e:
-        logger.exception(f"Failed to initialize RAG client for document {document_id}: {str(e)}")
-        return False
-    
-    try:
-        rag.index_document(
-            document_bytes=document_bytes,
-            extension=extension,
-            document_id=str(document_id),
-            user_id=user_id
-        )
-        return True
-    except Exception as e:
-        logger.exception(f"Failed to index document {document_id}: {str(e)}")
-        return False
-
+async def process_unindexed_documents(pipeline: IndexingPipeline, leases: DocumentLeaseKeeper):
+    # Захватываем документы порциями: пока конвейер занят, остальные остаются доступны другим репликам
+    while True:
+        documents = await leases.claim(rag_settings.indexer_claim_batch_size)
+        if not documents:
+            break
 
-async def process_unindexed_documents():
-    async with AsyncSessionLocal() as session:
-        unindexed = await DocumentDAO.get_all_unindexed(session)
-        
-        for document in unindexed:
+        for document in documents:
             logger.info(f"Indexing document {document.id}: {document.name}")
-            
-            success = await index_document(
-                document.id,
-                document.s3_path,
-                document.filename,
-                document.user_id
+            await pipeline.submit(
+                IndexingJob(
+                    document_id=document.id,
+                    s3_path=document.s3_path,
+                    filename=document.filename,
+                    user_id=document.user_id,
+                    extension=get_file_extension(document.filename),
+                )
             )
-            
-            if success:
-                await DocumentDAO.mark_as_indexed(session, document.id)
-                await session.commit()
-                logger.info(f"Successfully indexed document {document.id}")
-            else:
-                logger.exception(f"Failed to index document {document.id}")
+
+    await pipeline.join()
 
 
 async def main():
     # Ждем доступности Qdrant перед началом работы
-    if not await wait_for_qdrant():
+    if rag_settings.vector_store == "qdrant" and not await wait_for_qdrant():
         logger.error("Cannot start indexing worker: Qdrant is not available")
         return
-    
-    while True:
-        try:
-            await process_unindexed_documents()
-        except Exception as e:
-            logger.exception(f"Error in indexing worker: {str(e)}")
-        
-        await asyncio.sleep(30)
+
+    start_metrics_server()
+
+    # Загружаем модель один раз на весь процесс, дальше она переиспользуется для всех документов
+    try:
+        rag = await asyncio.to_thread(get_rag)
+    except Exception as e:
+        logger.exception(f"Cannot start indexing worker: failed to initialize RAG: {str(e)}")
+        return
+    logger.info("RAG engine is loaded and warmed up")
+
+    leases = DocumentLeaseKeeper()
+    logger.info(f"Indexing worker {leases.owner} is starting")
+
+    async def on_indexed(job: IndexingJob) -> None:
+        await leases.complete(job.document_id)
+        logger.info(f"Successfully indexed document {job.document_id}")
+
+    async def on_failed(job: IndexingJob) -> None:
+        leases.abandon(job.document_id)
+        logger.error(f"Failed to index document {job.document_id}, it will be retried after the lease expires")
+
+    await files_repository.start()
+    pipeline = IndexingPipeline(rag, on_indexed=on_indexed, on_failed=on_failed)
+    pipeline.start()
+    leases.start()
+
+    listener = DocumentNotificationListener(rag_settings.indexer_notify_channel)
+    await listener.connect()
+    try:
+        while True:
+            try:
+                await process_unindexed_documents(pipeline, leases)
+            except Exception as e:
+                logger.exception(f"Error in indexing worker: {str(e)}")
+            update_system_metrics()
+
+            # Просыпаемся по NOTIFY о новом документе, редкий проход по таблице страхует от потерянных событий.
+            # Без подписки возвращаемся к частому опросу.
+            if listener.connected:
+                await listener.wait(rag_settings.indexer_sweep_interval)
+            else:
+                await listener.wait(rag_settings.indexer_poll_interval)
+    finally:
+        await listener.close()
+        await pipeline.stop()
+        await leases.stop()
+        await files_repository.close()
 
 
 if __name__ == "__main__":
@@ -1,10 +1,13 @@
 import uuid
+from typing import AsyncIterator
 from fastapi import HTTPException, UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 from documents.dao import DocumentDAO
 from documents.schema import DocumentCreate, DocumentResponse
-from core.files import files_repository
+from core.files import FileTooLargeError, file_too_large_message, files_repository
+from core.configs.backend import backend_settings
 from core.configs.deployment import deployment_settings
+from core.configs.s3 import s3_settings
 
 
 def get_file_extension(filename: str) -> str:
@@ -15,20 +18,38 @@ def get_s3_path(filename: str) -> str:
     return f"{deployment_settings.environment}/documents/{filename}"
 
 
+def get_file_too_large_error(max_size: int, file_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=file_too_large_message(max_size, file_size)
+    )
+
+
+async def iter_upload_file(file: UploadFile, chunk_size: int) -> AsyncIterator[bytes]:
+    while chunk := await file.read(chunk_size):
+        yield chunk
+
+
 async def upload_document(
     db: AsyncSession,
     file: UploadFile,
     document_data: DocumentCreate,
-    user_id: int,
-    file_content: bytes = None
+    user_id: int
 ) -> DocumentResponse:
     file_extension = get_file_extension(file.filename)
     unique_filename = f"{uuid.uuid4()}.{file_extension}" if file_extension else str(uuid.uuid4())
     s3_path = get_s3_path(unique_filename)
     
-    if file_content is None:
-        file_content = await file.read()
-    await files_repository.upload_file(file_content, s3_path)
+    # Файл уходит в S3 по частям, лимит размера проверяется по мере чтения
+    try:
+        await files_repository.upload_stream(
+            iter_upload_file(file, s3_settings.upload_chunk_size),
+            s3_path,
+            max_size=backend_settings.max_file_size
+        )
+    except FileTooLargeError as e:
+        # Starlette уже разобрал форму во временный файл, поэтому полный размер известен
+        raise get_file_too_large_error(e.max_size, file.size or 0)
     
     db_document = await DocumentDAO.create(
         db,
@@ -37,6 +58,7 @@ async def upload_document(
         s3_path=s3_path,
         user_id=user_id
     )
+    await DocumentDAO.notify_uploaded(db, db_document.id)
     await db.commit()
     
     return DocumentResponse.model_validate(db_document)
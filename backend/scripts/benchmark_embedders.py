@@ -0,0 +1,78 @@
+import argparse
+import multiprocessing
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path to allow imports from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import psutil
+from loguru import logger
+from core.configs.rag import rag_settings
+from scripts.benchmark_embedding_batching import load_chunks
+
+
+def run_backend(model: str, backend: str, file_name: str | None, chunks: list[str], batch_size: int, queue) -> None:
+    """Замер в отдельном процессе, чтобы холодный старт и память не смешивались между бэкендами"""
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    start_time = time.perf_counter()
+    from sentence_transformers import SentenceTransformer
+
+    model_kwargs = {"file_name": file_name} if file_name else None
+    encoder = SentenceTransformer(model, backend=backend, model_kwargs=model_kwargs)
+    encoder.encode([rag_settings.warmup_text])
+    cold_start = time.perf_counter() - start_time
+    memory = process.memory_info().rss - rss_before
+
+    start_time = time.perf_counter()
+    embeddings = encoder.encode(chunks, batch_size=batch_size, normalize_embeddings=True)
+    duration = time.perf_counter() - start_time
+    queue.put((cold_start, memory, len(chunks) / duration, embeddings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedder backends: throughput, cold start and memory")
+    parser.add_argument("path", type=Path, help="PDF or text file used as corpus")
+    parser.add_argument("--onnx-path", default=rag_settings.embedding_onnx_path,
+                        help="Model exported by scripts/export_onnx_embedder.py")
+    parser.add_argument("--onnx-files", nargs="+", default=["onnx/model.onnx"],
+                        help="ONNX files to compare, e.g. onnx/model_qint8_avx512_vnni.onnx")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=2000, help="Max chunks to encode")
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.path)[:args.limit]
+    logger.info(f"Corpus: {len(chunks)} chunks")
+
+    variants = [("torch", rag_settings.model_name, "torch", None)]
+    for file_name in args.onnx_files:
+        variants.append((file_name, args.onnx_path or rag_settings.model_name, "onnx", file_name))
+
+    context = multiprocessing.get_context("spawn")
+    reference = None
+    print(f"{'backend':>40} | {'cold start s':>12} | {'memory MB':>9} | {'sent/sec':>9} | {'min cos':>7}")
+    for name, model, backend, file_name in variants:
+        queue = context.Queue()
+        worker = context.Process(
+            target=run_backend,
+            args=(model, backend, file_name, chunks, args.batch_size, queue),
+        )
+        worker.start()
+        cold_start, memory, throughput, embeddings = queue.get()
+        worker.join()
+
+        if reference is None:
+            reference = embeddings
+        min_similarity = float(np.min(np.sum(reference * embeddings, axis=1)))
+        print(
+            f"{name:>40} | {cold_start:12.2f} | {memory / 1024 / 1024:9.0f} | {throughput:9.1f} | "
+            f"{min_similarity:7.4f}"
+        )
+    print(f"Vectors are compatible with the collection when min cos >= {rag_settings.embedding_onnx_min_similarity}")
+
+
+if __name__ == "__main__":
+    main()
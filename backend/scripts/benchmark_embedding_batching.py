@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add parent directory to path to allow imports from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+from loguru import logger
+from core.configs.rag import rag_settings
+from core.llm.rag.batching import EmbeddingBatcher
+
+
+def load_chunks(path: Path) -> list[str]:
+    """Прочитать PDF/текст и разбить его на чанки так же, как это делает индексатор"""
+    if path.suffix.lower() == ".pdf":
+        text = "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    else:
+        text = path.read_text(encoding="utf-8")
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=rag_settings.chunk_size,
+        chunk_overlap=rag_settings.chunk_overlap,
+        length_function=len,
+    )
+    return splitter.split_text(text)
+
+
+def make_documents(chunks: list[str], max_chunks_per_document: int, seed: int = 42) -> list[list[str]]:
+    """Нарезать корпус на много маленьких документов, как при потоке мелких загрузок"""
+    rng = random.Random(seed)
+    documents = []
+    position = 0
+    while position < len(chunks):
+        size = rng.randint(1, max_chunks_per_document)
+        documents.append(chunks[position:position + size])
+        position += size
+    return documents
+
+
+async def run_batched(embedder, documents: list[list[str]], batch_tokens: int, max_wait_ms: int) -> float:
+    executor = ThreadPoolExecutor(max_workers=1)
+    batcher = EmbeddingBatcher(
+        embed_fn=embedder.embed_documents,
+        max_batch_tokens=batch_tokens,
+        max_wait_ms=max_wait_ms,
+        executor=executor,
+    )
+    batcher.start()
+    start_time = time.perf_counter()
+    await asyncio.gather(*(batcher.embed(document) for document in documents))
+    duration = time.perf_counter() - start_time
+    await batcher.stop()
+    executor.shutdown()
+    return duration
+
+
+def run_per_document(embedder, documents: list[list[str]]) -> float:
+    start_time = time.perf_counter()
+    for document in documents:
+        embedder.embed_documents(document)
+    return time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cross-document embedding batching")
+    parser.add_argument("path", type=Path, help="PDF or text file used as corpus")
+    parser.add_argument("--max-chunks-per-document", type=int, default=4)
+    parser.add_argument("--batch-tokens", type=int, nargs="+", default=[512, 2048, 8192, 32768])
+    parser.add_argument("--max-wait-ms", type=int, default=rag_settings.embed_batch_max_wait_ms)
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.path)
+    documents = make_documents(chunks, args.max_chunks_per_document)
+    logger.info(f"Corpus: {len(chunks)} chunks in {len(documents)} documents")
+
+    embedder = HuggingFaceEmbeddings(model_name=rag_settings.model_name)
+    embedder.embed_query(rag_settings.warmup_text)
+
+    duration = run_per_document(embedder, documents)
+    print(f"{'batch tokens':>14} | {'seconds':>8} | {'chunks/sec':>10}")
+    print(f"{'per document':>14} | {duration:8.2f} | {len(chunks) / duration:10.1f}")
+    for batch_tokens in args.batch_tokens:
+        duration = asyncio.run(run_batched(embedder, documents, batch_tokens, args.max_wait_ms))
+        print(f"{batch_tokens:>14} | {duration:8.2f} | {len(chunks) / duration:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path to allow imports from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import (
+    Distance,
+    PointStruct,
+    QuantizationSearchParams,
+    SearchParams,
+    VectorParams,
+)
+from loguru import logger
+from core.configs.rag import qdrant_settings
+from core.llm.rag.qdrant_collection import build_quantization_config, create_qdrant_client
+
+# Плотный вектор коллекции безымянный, рядом с ним лежит разреженный BM25
+DENSE_VECTOR_NAME = ""
+
+
+def load_points(client: QdrantClient, collection: str, limit: int) -> list[PointStruct]:
+    """Взять векторы из рабочей коллекции, чтобы сравнивать режимы на одном и том же корпусе"""
+    points = []
+    offset = None
+    while len(points) < limit:
+        batch, offset = client.scroll(
+            collection_name=collection,
+            limit=min(1000, limit - len(points)),
+            offset=offset,
+            with_payload=False,
+            with_vectors=[DENSE_VECTOR_NAME],
+        )
+        for point in batch:
+            # У коллекции с именованными векторами Qdrant возвращает словарь по именам
+            vector = point.vector[DENSE_VECTOR_NAME] if isinstance(point.vector, dict) else point.vector
+            points.append(PointStruct(id=point.id, vector=vector, payload={}))
+        if offset is None:
+            break
+    return points
+
+
+def create_collection(client: QdrantClient, name: str, mode: str, on_disk: bool, points: list[PointStruct]) -> None:
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    client.create_collection(
+        collection_name=name,
+        vectors_config=VectorParams(size=len(points[0].vector), distance=Distance.COSINE, on_disk=on_disk),
+        quantization_config=build_quantization_config(mode),
+    )
+    for start in range(0, len(points), 256):
+        client.upsert(collection_name=name, points=points[start:start + 256], wait=True)
+
+
+def run_queries(
+    client: QdrantClient,
+    collection: str,
+    queries: list[list[float]],
+    k: int,
+    search_params: SearchParams | None,
+) -> tuple[list[set], list[float]]:
+    results, latencies = [], []
+    for query in queries:
+        start_time = time.perf_counter()
+        response = client.query_points(
+            collection_name=collection,
+            query=query,
+            limit=k,
+            search_params=search_params,
+            with_payload=False,
+        )
+        latencies.append(time.perf_counter() - start_time)
+        results.append({point.id for point in response.points})
+    return results, latencies
+
+
+def recall_at_k(results: list[set], ground_truth: list[set], k: int) -> float:
+    return float(np.mean([len(found & expected) / k for found, expected in zip(results, ground_truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Qdrant vector quantization against float32 baseline")
+    parser.add_argument("--collection", default=qdrant_settings.collection, help="Collection used as corpus")
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[1.0, 2.0, 4.0])
+    parser.add_argument("--on-disk", action="store_true", help="Keep original vectors on disk")
+    parser.add_argument("--keep", action="store_true", help="Do not delete benchmark collections")
+    args = parser.parse_args()
+
+    client = create_qdrant_client()
+    points = load_points(client, args.collection, args.points)
+    if not points:
+        logger.error(f"Collection {args.collection} is empty")
+        return
+    logger.info(f"Corpus: {len(points)} points from {args.collection}")
+
+    # Запросы — зашумленные векторы корпуса, чтобы ближайший сосед не совпадал с запросом тривиально
+    rng = random.Random(42)
+    noise = np.random.default_rng(42)
+    queries = []
+    for point in rng.sample(points, min(args.queries, len(points))):
+        vector = np.asarray(point.vector, dtype=np.float32)
+        vector = vector + noise.normal(0, 0.05, vector.shape).astype(np.float32)
+        queries.append((vector / np.linalg.norm(vector)).tolist())
+
+    collections = {mode: f"{args.collection}_bench_{mode}" for mode in ("none", "scalar", "binary")}
+    for mode, name in collections.items():
+        logger.info(f"Creating {name}")
+        create_collection(client, name, mode, args.on_disk and mode != "none", points)
+
+    try:
+        # Точный перебор по float32 — эталон для recall
+        ground_truth, _ = run_queries(client, collections["none"], queries, args.k, SearchParams(exact=True))
+
+        print(f"{'mode':>8} | {'oversampling':>12} | {'rescore':>7} | {'recall@' + str(args.k):>9} | {'p95 ms':>8}")
+        results, latencies = run_queries(client, collections["none"], queries, args.k, None)
+        print(
+            f"{'none':>8} | {'-':>12} | {'-':>7} | {recall_at_k(results, ground_truth, args.k):9.3f} | "
+            f"{np.percentile(latencies, 95) * 1000:8.2f}"
+        )
+        for mode in ("scalar", "binary"):
+            for rescore in (False, True):
+                for oversampling in args.oversampling:
+                    search_params = SearchParams(
+                        quantization=QuantizationSearchParams(rescore=rescore, oversampling=oversampling)
+                    )
+                    results, latencies = run_queries(client, collections[mode], queries, args.k, search_params)
+                    print(
+                        f"{mode:>8} | {oversampling:12.1f} | {str(rescore):>7} | "
+                        f"{recall_at_k(results, ground_truth, args.k):9.3f} | "
+                        f"{np.percentile(latencies, 95) * 1000:8.2f}"
+                    )
+    finally:
+        if not args.keep:
+            for name in collections.values():
+                client.delete_collection(name)
+
+
+if __name__ == "__main__":
+    main()
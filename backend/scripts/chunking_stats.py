@@ -0,0 +1,63 @@
+import argparse
+import sys
+from pathlib import Path
+
+# Add parent directory to path to allow imports from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+from sentence_transformers import SentenceTransformer
+from loguru import logger
+from core.configs.rag import rag_settings
+from core.llm.rag.tokens import TokenCounter
+
+
+def load_text(path: Path) -> str:
+    if path.suffix.lower() == ".pdf":
+        return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    return path.read_text(encoding="utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare character and token chunking against the model window")
+    parser.add_argument("path", type=Path, help="PDF or text file used as corpus")
+    parser.add_argument("--model", default=rag_settings.model_name)
+    parser.add_argument("--chunk-tokens", type=int, default=rag_settings.chunk_tokens,
+                        help="Token target, 0 for the whole model window")
+    parser.add_argument("--overlap-tokens", type=int, default=rag_settings.chunk_overlap_tokens)
+    args = parser.parse_args()
+
+    counter = TokenCounter(SentenceTransformer(args.model))
+    text = load_text(args.path)
+    logger.info(f"Model window: {counter.window} tokens")
+
+    splitters = {
+        f"chars {rag_settings.chunk_size}/{rag_settings.chunk_overlap}": RecursiveCharacterTextSplitter(
+            chunk_size=rag_settings.chunk_size,
+            chunk_overlap=rag_settings.chunk_overlap,
+            length_function=len,
+        ),
+        f"tokens {args.chunk_tokens or counter.window}/{args.overlap_tokens}": RecursiveCharacterTextSplitter(
+            chunk_size=args.chunk_tokens or counter.window,
+            chunk_overlap=args.overlap_tokens,
+            length_function=counter,
+        ),
+    }
+
+    print(f"{'splitter':>20} | {'chunks':>7} | {'mean tok':>8} | {'p95 tok':>7} | {'truncated':>9} | {'lost tok':>8} | {'window use':>10}")
+    for name, splitter in splitters.items():
+        tokens = np.asarray(counter.count_many(splitter.split_text(text)))
+        truncated = tokens > counter.window
+        lost = np.maximum(tokens - counter.window, 0).sum()
+        # Доля окна, которую реально видит модель, в среднем по чанкам
+        window_use = np.minimum(tokens, counter.window).mean() / counter.window
+        print(
+            f"{name:>20} | {len(tokens):7d} | {tokens.mean():8.1f} | {np.percentile(tokens, 95):7.0f} | "
+            f"{truncated.mean():9.1%} | {lost:8d} | {window_use:10.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
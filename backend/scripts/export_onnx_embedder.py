@@ -0,0 +1,79 @@
+import argparse
+import sys
+from pathlib import Path
+
+# Add parent directory to path to allow imports from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+from loguru import logger
+from core.configs.rag import rag_settings
+
+
+# Предложения для проверки совместимости векторов с torch моделью
+CHECK_SENTENCES = [
+    rag_settings.warmup_text,
+    "Производная функции показывает скорость ее изменения в точке.",
+    "Фотосинтез превращает энергию света в химическую энергию.",
+    "The mitochondria is the powerhouse of the cell.",
+    "Метод градиентного спуска ищет минимум функции, двигаясь против градиента.",
+    "Закон Ома связывает силу тока, напряжение и сопротивление проводника.",
+    "Python lists are mutable, while tuples are immutable.",
+    "Вторая мировая война закончилась в 1945 году.",
+]
+
+
+def check_similarity(reference: SentenceTransformer, candidate: SentenceTransformer) -> tuple[float, float]:
+    expected = reference.encode(CHECK_SENTENCES, normalize_embeddings=True)
+    actual = candidate.encode(CHECK_SENTENCES, normalize_embeddings=True)
+    similarities = np.sum(expected * actual, axis=1)
+    return float(similarities.min()), float(similarities.mean())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the sentence embedder to ONNX with optional int8 quantization")
+    parser.add_argument("output", type=Path, help="Directory for the exported model (RAG_EMBEDDING_ONNX_PATH)")
+    parser.add_argument("--model", default=rag_settings.model_name)
+    parser.add_argument(
+        "--quantize",
+        choices=["arm64", "avx2", "avx512", "avx512_vnni"],
+        help="Also export a dynamically int8-quantized model for this CPU instruction set",
+    )
+    args = parser.parse_args()
+
+    logger.info(f"Exporting {args.model} to ONNX")
+    model = SentenceTransformer(args.model, backend="onnx")
+    model.save_pretrained(str(args.output))
+    files = ["onnx/model.onnx"]
+
+    if args.quantize:
+        logger.info(f"Quantizing to int8 for {args.quantize}")
+        export_dynamic_quantized_onnx_model(model, args.quantize, str(args.output))
+        files.append(f"onnx/model_qint8_{args.quantize}.onnx")
+
+    reference = SentenceTransformer(args.model, backend="torch")
+    failed = False
+    for file_name in files:
+        candidate = SentenceTransformer(
+            str(args.output),
+            backend="onnx",
+            model_kwargs={"file_name": file_name},
+        )
+        min_similarity, mean_similarity = check_similarity(reference, candidate)
+        compatible = min_similarity >= rag_settings.embedding_onnx_min_similarity
+        failed = failed or not compatible
+        print(
+            f"{file_name}: min cosine {min_similarity:.4f}, mean cosine {mean_similarity:.4f} "
+            f"({'ok' if compatible else 'below'} RAG_EMBEDDING_ONNX_MIN_SIMILARITY="
+            f"{rag_settings.embedding_onnx_min_similarity})"
+        )
+
+    if failed:
+        logger.error("Exported model is not compatible with the existing collection, reindex before switching")
+        sys.exit(1)
+    logger.info(f"Set RAG_EMBEDDING_BACKEND=onnx and RAG_EMBEDDING_ONNX_PATH={args.output}")
+
+
+if __name__ == "__main__":
+    main()
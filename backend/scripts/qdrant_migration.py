@@ -1,21 +1,44 @@
 import sys
 import time
+import uuid
 from pathlib import Path
 
 # Add parent directory to path to allow imports from core
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, VectorParams, PayloadSchemaType
+from qdrant_client.http.models import (
+    Filter,
+    IsEmptyCondition,
+    IsNullCondition,
+    KeywordIndexParams,
+    KeywordIndexType,
+    PayloadField,
+    PayloadSchemaType,
+    PointStruct,
+)
 from loguru import logger
 from core.configs.rag import qdrant_settings, rag_settings
+from core.llm.rag.qdrant_collection import (
+    SPARSE_VECTOR_NAME,
+    TENANT_PAYLOAD_KEY,
+    VERSION_POINT_ID,
+    build_quantization_config,
+    build_quantization_config_diff,
+    build_sparse_vectors_config,
+    build_vectors_config,
+    build_vectors_config_diff,
+    create_qdrant_client,
+    tenant_value,
+    version_collection_name,
+)
 
 
 def wait_for_qdrant(max_retries=30, delay=2):
     """Wait for Qdrant to be ready"""
     for attempt in range(max_retries):
         try:
-            client = QdrantClient(url=qdrant_settings.host)
+            client = create_qdrant_client()
             client.get_collections()
             logger.info(f"Qdrant is ready after {attempt + 1} attempts")
             return client
@@ -27,6 +50,39 @@ def wait_for_qdrant(max_retries=30, delay=2):
                 raise Exception(f"Qdrant is not available after {max_retries} attempts")
 
 
+def backfill_tenant_ids(client: QdrantClient, batch_size: int = 1000) -> int:
+    """Проставить tenant поле чанкам, проиндексированным до его появления"""
+    scroll_filter = Filter(
+        must=[IsEmptyCondition(is_empty=PayloadField(key=TENANT_PAYLOAD_KEY))],
+        must_not=[
+            IsEmptyCondition(is_empty=PayloadField(key="metadata.user_id")),
+            IsNullCondition(is_null=PayloadField(key="metadata.user_id")),
+        ],
+    )
+    updated = 0
+    while True:
+        # Обновленные точки выпадают из фильтра, поэтому всегда читаем первую страницу
+        points, _ = client.scroll(
+            collection_name=qdrant_settings.collection,
+            scroll_filter=scroll_filter,
+            limit=batch_size,
+            with_payload=["metadata.user_id"],
+            with_vectors=False,
+        )
+        if not points:
+            return updated
+        by_user: dict[int, list] = {}
+        for point in points:
+            by_user.setdefault(point.payload["metadata"]["user_id"], []).append(point.id)
+        for user_id, point_ids in by_user.items():
+            client.set_payload(
+                collection_name=qdrant_settings.collection,
+                payload={TENANT_PAYLOAD_KEY: tenant_value(user_id)},
+                points=point_ids,
+            )
+        updated += len(points)
+
+
 def migrate_qdrant():
     logger.info("Starting Qdrant migration...")
     client = wait_for_qdrant()
@@ -38,19 +94,64 @@ def migrate_qdrant():
         logger.info(f"Creating collection: {qdrant_settings.collection}")
         client.create_collection(
             collection_name=qdrant_settings.collection,
-            vectors_config=VectorParams(size=rag_settings.embedding_size, distance=Distance.COSINE)
+            vectors_config=build_vectors_config(),
+            sparse_vectors_config=build_sparse_vectors_config(),
+            quantization_config=build_quantization_config()
         )
-        try:
-            client.create_payload_index(
-                collection_name=qdrant_settings.collection,
-                field_name="document_id",
-                field_schema=PayloadSchemaType.KEYWORD
-            )
-        except Exception as e:
-            logger.warning(f"Warning: Could not create payload index (may already exist): {e}")
         logger.info(f"Collection {qdrant_settings.collection} created successfully")
     else:
         logger.info(f"Collection {qdrant_settings.collection} already exists")
+        # Новые векторы в существующую коллекцию не добавить, для гибридного поиска нужна переиндексация
+        sparse_vectors = client.get_collection(qdrant_settings.collection).config.params.sparse_vectors or {}
+        if SPARSE_VECTOR_NAME not in sparse_vectors:
+            logger.warning(
+                f"Collection {qdrant_settings.collection} has no '{SPARSE_VECTOR_NAME}' sparse vectors. "
+                "Recreate it and reindex documents to enable hybrid search"
+            )
+        # Приводим хранение векторов к текущим настройкам, Qdrant перестроит сегменты в фоне
+        client.update_collection(
+            collection_name=qdrant_settings.collection,
+            vectors_config=build_vectors_config_diff(),
+            quantization_config=build_quantization_config_diff()
+        )
+        logger.info(
+            f"Collection {qdrant_settings.collection} storage updated: "
+            f"quantization={rag_settings.quantization}, vectors_on_disk={rag_settings.vectors_on_disk}"
+        )
+
+    # Чанки хранятся в формате langchain, поля документа лежат внутри metadata
+    try:
+        client.create_payload_index(
+            collection_name=qdrant_settings.collection,
+            field_name="metadata.document_id",
+            field_schema=PayloadSchemaType.KEYWORD
+        )
+    except Exception as e:
+        logger.warning(f"Warning: Could not create payload index (may already exist): {e}")
+
+    # Tenant индекс группирует точки пользователя в хранилище, поиск с фильтром по владельцу
+    # не зависит от размера всей коллекции
+    try:
+        client.create_payload_index(
+            collection_name=qdrant_settings.collection,
+            field_name=TENANT_PAYLOAD_KEY,
+            field_schema=KeywordIndexParams(type=KeywordIndexType.KEYWORD, is_tenant=True)
+        )
+    except Exception as e:
+        logger.warning(f"Warning: Could not create tenant payload index (may already exist): {e}")
+
+    updated = backfill_tenant_ids(client)
+    if updated:
+        logger.info(f"Backfilled {TENANT_PAYLOAD_KEY} for {updated} points")
+
+    # Общая версия коллекции для кэшей выдач: индексатор меняет ее после записи, API перечитывает
+    if version_collection_name() not in collections:
+        client.create_collection(collection_name=version_collection_name(), vectors_config={})
+        client.upsert(
+            collection_name=version_collection_name(),
+            points=[PointStruct(id=VERSION_POINT_ID, vector={}, payload={"version": uuid.uuid4().hex})],
+        )
+        logger.info(f"Collection {version_collection_name()} created successfully")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,186 @@
+import numpy as np
+import pytest
+
+from core.llm.rag.mmap_store import INITIAL_CAPACITY, MmapVectorStore, StoredPoint
+
+DIMENSION = 8
+
+
+def make_point(point_id: str, document_id: str = "doc", user_id: int | None = 1, content: str = "") -> StoredPoint:
+    return StoredPoint(
+        id=point_id,
+        document_id=document_id,
+        user_id=user_id,
+        content=content or f"content {point_id}",
+        metadata={"chunk": point_id},
+    )
+
+
+def basis(index: int) -> np.ndarray:
+    vector = np.zeros(DIMENSION, dtype=np.float32)
+    vector[index % DIMENSION] = 1.0
+    return vector
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MmapVectorStore(str(tmp_path / "vectors"), DIMENSION, analyzer=str.split)
+    yield store
+    store.close()
+
+
+def test_add_and_search_returns_nearest_first(store):
+    store.upsert([make_point("a"), make_point("b"), make_point("c")], np.stack([basis(0), basis(1), basis(2)]))
+
+    found = store.search((basis(1) * 3 + basis(2)).tolist(), k=2)
+
+    assert [point.id for point in found] == ["b", "c"]
+    assert found[0].score == pytest.approx(3 / np.sqrt(10))
+    assert found[0].metadata == {"chunk": "b"}
+    assert found[0].content == "content b"
+
+
+def test_upsert_replaces_point_with_same_id(store):
+    store.upsert([make_point("a", content="old")], basis(0)[None])
+    store.upsert([make_point("a", content="new")], basis(3)[None])
+
+    found = store.search(basis(3).tolist(), k=5)
+
+    assert [(point.id, point.content) for point in found] == [("a", "new")]
+    assert found[0].score == pytest.approx(1.0)
+
+
+def test_search_filters_by_document_and_user(store):
+    store.upsert(
+        [
+            make_point("a", document_id="d1", user_id=1),
+            make_point("b", document_id="d2", user_id=1),
+            make_point("c", document_id="d2", user_id=2),
+        ],
+        np.stack([basis(0), basis(0), basis(0)]),
+    )
+    query = basis(0).tolist()
+
+    assert {point.id for point in store.search(query, k=10, document_ids=["d2"])} == {"b", "c"}
+    assert {point.id for point in store.search(query, k=10, user_id=1)} == {"a", "b"}
+    assert [point.id for point in store.search(query, k=10, document_ids=["d2"], user_id=2)] == ["c"]
+    assert store.search(query, k=10, document_ids=["missing"]) == []
+
+
+def test_search_terms_ranks_matches_and_applies_filters(store):
+    store.upsert(
+        [
+            make_point("a", document_id="d1", content="vector store search"),
+            make_point("b", document_id="d2", content="vector"),
+            make_point("c", document_id="d2", content="unrelated text"),
+        ],
+        np.stack([basis(0), basis(1), basis(2)]),
+    )
+
+    assert [point.id for point in store.search_terms(["store", "search"], k=10)] == ["a"]
+    assert {point.id for point in store.search_terms(["vector"], k=10)} == {"a", "b"}
+    assert [point.id for point in store.search_terms(["vector"], k=10, document_ids=["d2"])] == ["b"]
+
+
+def test_delete_document_keeps_listed_ids_and_reuses_rows(store):
+    store.upsert(
+        [make_point("a", document_id="d1"), make_point("b", document_id="d1"), make_point("c", document_id="d2")],
+        np.stack([basis(0), basis(1), basis(2)]),
+    )
+
+    store.delete_document("d1", keep_ids={"b"})
+
+    assert store.get_ids("d1") == {"b"}
+    assert store.get_ids("d2") == {"c"}
+    assert [point.id for point in store.search(basis(0).tolist(), k=10, document_ids=["d1"])] == ["b"]
+    assert store.search_terms(["content", "a"], k=10, document_ids=["d1"])[0].id == "b"
+
+    # Освободившаяся строка уходит под новую точку, матрица не растет
+    size = store._size
+    store.upsert([make_point("d", document_id="d3")], basis(3)[None])
+    assert store._size == size
+    assert [point.id for point in store.search(basis(3).tolist(), k=1)] == ["d"]
+
+
+def test_reload_restores_points_after_growth(tmp_path):
+    path = str(tmp_path / "vectors")
+    count = INITIAL_CAPACITY + 10
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(count, DIMENSION)).astype(np.float32)
+    store = MmapVectorStore(path, DIMENSION)
+    store.upsert([make_point(str(i), document_id=f"d{i % 3}") for i in range(count)], vectors)
+    store.delete_document("d0")
+    store.close()
+
+    reopened = MmapVectorStore(path, DIMENSION)
+    try:
+        assert reopened.get_ids("d0") == set()
+        assert reopened.get_ids("d1") == {str(i) for i in range(count) if i % 3 == 1}
+        found = reopened.search(vectors[1].tolist(), k=1)
+        assert found[0].id == "1"
+        assert found[0].score == pytest.approx(1.0, abs=1e-5)
+    finally:
+        reopened.close()
+
+
+def test_reader_sees_writes_of_another_instance(tmp_path):
+    path = str(tmp_path / "vectors")
+    writer = MmapVectorStore(path, DIMENSION)
+    reader = MmapVectorStore(path, DIMENSION)
+    try:
+        writer.upsert([make_point("a")], basis(0)[None])
+        assert [point.id for point in reader.search(basis(0).tolist(), k=1)] == ["a"]
+
+        writer.delete_document("doc")
+        assert reader.search(basis(0).tolist(), k=1) == []
+    finally:
+        writer.close()
+        reader.close()
+
+
+def test_ivf_index_is_built_and_used_for_search(tmp_path):
+    path = str(tmp_path / "vectors")
+    rng = np.random.default_rng(1)
+    # Четыре разнесенных кластера, чтобы IVF находил ближайших соседей в просмотренных списках
+    centers = np.eye(DIMENSION, dtype=np.float32)[:4] * 10
+    vectors = np.concatenate([center + rng.normal(scale=0.1, size=(50, DIMENSION)) for center in centers])
+    vectors = vectors.astype(np.float32)
+    options = dict(ivf_enabled=True, ivf_min_points=100, ivf_lists=4, ivf_probes=1)
+
+    store = MmapVectorStore(path, DIMENSION, **options)
+    store.upsert([make_point(str(i)) for i in range(len(vectors))], vectors)
+    assert store._ivf is not None
+    assert store._ivf.built_for == len(vectors)
+    assert (tmp_path / "vectors" / "centroids.npy").exists()
+
+    query = vectors[120]
+    candidates = store._ivf.candidates(query / np.linalg.norm(query), store._size)
+    assert 0 < candidates.sum() < len(vectors)
+    assert store.search(query.tolist(), k=1)[0].id == "120"
+    store.close()
+
+    # Читатель берет готовые центроиды и списки из файлов, не пересобирая индекс
+    reopened = MmapVectorStore(path, DIMENSION, **options)
+    try:
+        assert reopened._ivf is not None
+        np.testing.assert_array_equal(reopened._ivf.assignment[:len(vectors)], store._ivf.assignment[:len(vectors)])
+        assert reopened.search(query.tolist(), k=1)[0].id == "120"
+    finally:
+        reopened.close()
+
+
+def test_ivf_falls_back_to_exact_search_when_probed_lists_are_too_small(tmp_path):
+    rng = np.random.default_rng(2)
+    centers = np.eye(DIMENSION, dtype=np.float32)[:4] * 10
+    vectors = np.concatenate([center + rng.normal(scale=0.1, size=(50, DIMENSION)) for center in centers])
+    store = MmapVectorStore(
+        str(tmp_path / "vectors"), DIMENSION, ivf_enabled=True, ivf_min_points=100, ivf_lists=4, ivf_probes=1
+    )
+    try:
+        store.upsert([make_point(str(i)) for i in range(len(vectors))], vectors.astype(np.float32))
+
+        found = store.search(centers[0].tolist(), k=120)
+
+        assert len(found) == 120
+    finally:
+        store.close()
@@ -1,16 +1,20 @@
 import os
+import sys
+import uuid
 from pathlib import Path
 from typing import List
 
 from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
 from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_experimental.text_splitter import SemanticChunker
-from langchain_qdrant import QdrantVectorStore
 from langchain_huggingface import HuggingFaceEmbeddings
 
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, VectorParams
+from qdrant_client.http.models import Distance, PointStruct, VectorParams
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+from core.llm.rag.semantic_chunker import SemanticChunker
+from core.llm.rag.tokens import TokenCounter
 
 
 def get_embedder():
@@ -44,29 +48,23 @@ def load_documents(folder: str) -> List[Document]:
     return docs
 
 
-def chunk_documents(docs: List[Document], embedder) -> List[Document]:
-    # 1) Семантический чанкер
+def chunk_documents(docs: List[Document], embedder) -> List[tuple[Document, list[float]]]:
+    # Предложения кодируются один раз, векторы чанков собираются из векторов предложений
+    # Предложения режутся по окну модели, чтобы ни одно не обрезалось при кодировании
+    token_counter = TokenCounter(embedder._client)
     semantic_chunker = SemanticChunker(
-        embeddings=embedder,
+        encode=embedder.embed_documents,
+        count_tokens=token_counter,
+        window=token_counter.window,
+        max_size=1000,
+        min_size=200,
     )
 
-    semantically_split_docs = []
+    chunks = []
     for d in docs:
-        pieces = semantic_chunker.split_text(d.page_content)
-        for p in pieces:
-            semantically_split_docs.append(Document(page_content=p, metadata=d.metadata))
-
-    docs = semantically_split_docs
-
-    # 2) Recursive character splitter — для ровных размеров и overlap
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len,
-    )
-
-    final_docs = splitter.split_documents(semantically_split_docs)
-    return final_docs
+        for chunk in semantic_chunker.split_text(d.page_content):
+            chunks.append((Document(page_content=chunk.content, metadata=d.metadata), chunk.embedding))
+    return chunks
 
 
 def index_folder(folder: str, collection: str = "lectures"):
@@ -79,13 +77,18 @@ def index_folder(folder: str, collection: str = "lectures"):
     chunks = chunk_documents(docs, embedder)
     print(f"Created {len(chunks)} chunks")
 
-    qdrant = QdrantVectorStore(
-        client=client,
+    # Payload в формате langchain_qdrant, векторы уже посчитаны чанкером
+    client.upsert(
         collection_name=collection,
-        embedding=embedder,
+        points=[
+            PointStruct(
+                id=str(uuid.uuid4()),
+                vector=embedding,
+                payload={"page_content": doc.page_content, "metadata": doc.metadata},
+            )
+            for doc, embedding in chunks
+        ],
     )
-
-    qdrant.add_documents(chunks)
     print("Indexing finished!")
 
 